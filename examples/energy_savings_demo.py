@@ -19,6 +19,12 @@ def demonstrate_energy_savings():
     total_energy_saved = 0.0
     total_duration = 0.0
     
+    # Allocate inputs once at the largest size; each case takes a view so the
+    # caching allocator stays warm and no case pays a fresh cudaMalloc
+    max_size = 2048
+    A_all = torch.randn(max_size, max_size, device='cuda')
+    B_all = torch.randn(max_size, max_size, device='cuda')
+    
     for desc, prompt in test_cases:
         print(f"\nTest Case: {desc}")
         print(f"Prompt: {prompt}")
@@ -28,10 +34,9 @@ def demonstrate_energy_savings():
         
         # Run test workload
         size = 1024 if "simple" in desc.lower() else 2048
+        A = A_all[:size, :size]
+        B = B_all[:size, :size]
         with governor.get_execution_context():
-            A = torch.randn(size, size, device='cuda')
-            B = torch.randn(size, size, device='cuda')
-            
             start = time.time()
             C = torch.matmul(A, B)
             torch.cuda.synchronize()
@@ -54,11 +59,6 @@ def demonstrate_energy_savings():
             print(f"Power Draw: {runtime_metrics['power']}")
         print(f"Execution Time: {duration*1000:.1f}ms")
         print(f"Energy Saved: {format_joules(joules_saved)}")
-        
-        # Cleanup
-        del A, B, C
-        torch.cuda.empty_cache()
-        time.sleep(1)  # Let GPU cool between tests
     
     # Final summary
     print("\nFinal Energy Analysis")
@@ -1,7 +1,11 @@
-import torch, time, math, argparse
+import torch, time, math, argparse, threading
 
 # Heavy batched matmul test to saturate GPU
 
+# Route any FP32 matmul/conv fallback through TF32 tensor cores
+torch.backends.cuda.matmul.allow_tf32 = True
+torch.backends.cudnn.allow_tf32 = True
+
 def parse_args():
     parser = argparse.ArgumentParser(description='Run heavy GPU saturation test')
     parser.add_argument('--iterations', type=int, default=40,
@@ -10,79 +14,168 @@ def parse_args():
                        help='Compilation mode: auto=try if Triton available, force=require compilation, disable=never compile')
     parser.add_argument('--target-util', type=float, default=0.8,
                        help='Target VRAM utilization (0.0-1.0)')
+    parser.add_argument('--fast-accum', action='store_true',
+                       help='Allow reduced-precision (FP16/BF16) GEMM reductions; throughput only, not numerically safe for training')
     return parser.parse_args()
 
-def pick_sizes(total_memory_mb, target_fraction=0.6, dtype=torch.float16):
-    bytes_per_elem = 2 if dtype==torch.float16 else 4
+def pick_dtype(cc):
+    # BF16 on Ampere+ (FP32 range, no loss scaling), FP16 on Volta/Turing,
+    # FP32 on older parts where FP16 can be slower than FP32
+    if cc >= (8, 0):
+        return torch.bfloat16
+    if cc >= (7, 0):
+        return torch.float16
+    return torch.float32
+
+def gemm_tile(cc):
+    # GEMM tile edge: 128 for Ampere/Ada WMMA/mma tiles, 256 for Hopper+ wgmma
+    return 128 if cc < (9, 0) else 256
+
+def pick_sizes(total_memory_mb, target_fraction=0.6, dtype=torch.float16, cc=(8, 0)):
+    bytes_per_elem = 2 if dtype in (torch.float16, torch.bfloat16) else 4
     allowed_bytes = total_memory_mb * 1024**2 * target_fraction
     allowed_for_matrices = allowed_bytes / 3.0
     B = 8
     N = int(math.sqrt(max(1, allowed_for_matrices / (B * bytes_per_elem))))
     # Cap to a safer maximum to avoid kernel/operator limitations on some devices
     N = max(256, min(N, 4096))
+    # Round down to a whole number of tiles so cuBLAS takes its aligned fast
+    # path with no partial-tile epilogue; never round to zero
+    tile = gemm_tile(cc)
+    N = max(tile, (N // tile) * tile)
     return B, N
 
 
-def heavy_batched_matmul_test(device='cuda', dtype=torch.float16, iterations=40, compile_mode='auto', target_util=0.8):
+def heavy_batched_matmul_test(device='cuda', dtype=None, iterations=40, compile_mode='auto', target_util=0.8, fast_accum=False):
     assert torch.cuda.is_available(), "No CUDA"
+    # --fast-accum makes sure cuBLAS may pick reduced-precision reduction
+    # kernels; otherwise the flags keep PyTorch's (or the caller's) setting
+    if fast_accum:
+        torch.backends.cuda.matmul.allow_fp16_reduced_precision_reduction = True
+        torch.backends.cuda.matmul.allow_bf16_reduced_precision_reduction = True
     props = torch.cuda.get_device_properties(0)
     total_mb = props.total_memory / 1024**2
-    B, N = pick_sizes(total_mb, target_fraction=target_util, dtype=dtype)
-    print(f"Using batch={B}, N={N}, dtype={dtype}, VRAM={total_mb:.0f}MB")
+    cc = torch.cuda.get_device_capability(0)
+    if dtype is None:
+        dtype = pick_dtype(cc)
+    B, N = pick_sizes(total_mb, target_fraction=target_util, dtype=dtype, cc=cc)
+    tile = gemm_tile(cc)
+    print(f"Using batch={B}, N={N}, dtype={dtype}, sm_{cc[0]}{cc[1]}, VRAM={total_mb:.0f}MB")
+    print(f"GEMM tiling: {N // tile}x{N // tile} tiles of {tile}x{tile}")
+    if fast_accum:
+        print("Fast accumulation enabled: throughput-only path, results are not numerically safe for training")
 
-    A = torch.randn(B, N, N, device=device, dtype=dtype)
-    Bm = torch.randn(B, N, N, device=device, dtype=dtype)
+    # Throughput test: relu(bmm(A, B)) is never validated. Only one (N, N)
+    # slice per operand goes through the RNG; the rest of the batch is a
+    # broadcast copy (memcpy-class kernel). Random rather than constant data
+    # keeps the tensor cores' switching activity, and so power, realistic.
+    A = torch.empty(B, N, N, device=device, dtype=dtype)
+    Bm = torch.empty_like(A)
+    for t in (A, Bm):
+        t[0].normal_()
+        t[1:].copy_(t[0].expand(B - 1, N, N))
 
     def step(a, b):
-        return torch.bmm(a, b)
+        # Compiled, Inductor's Triton bmm template applies the ReLU in its
+        # epilogue so the (B, N, N) result is written to DRAM only once
+        return torch.relu(torch.bmm(a, b))
+
+    # Eager fallback: one preallocated output, ReLU in place, so the hot loop
+    # never goes back to the caching allocator. The buffer is only allocated
+    # once the fallback is chosen, below.
+    out = None
+
+    def step_eager(a, b):
+        torch.bmm(a, b, out=out)
+        return torch.relu_(out)
 
     # Handle compilation based on mode
-    compiled = False
+    run = step_eager
     if compile_mode != 'disable':
         try:
             import triton  # type: ignore
             try:
-                step_compiled = torch.compile(step)
-                compiled = True
+                # Fixed shapes: max-autotune picks a fused Triton GEMM template
+                # and, like reduce-overhead, captures a CUDA graph for the step
+                step_compiled = torch.compile(step, mode="max-autotune", fullgraph=True, dynamic=False)
+                # Warm up outside the timed region: the first call traces and
+                # generates code, the second records the CUDA graph
+                for _ in range(2):
+                    step_compiled(A, Bm)
+                    torch.cuda.synchronize()
+                run = step_compiled
                 print("Successfully compiled with Triton acceleration")
             except Exception as e:
                 if compile_mode == 'force':
                     raise RuntimeError("Compilation required but failed") from e
-                print("Compilation attempted but failed, falling back to uncompiled")
-                compiled = False
+                print("Compilation attempted but failed, falling back to uncompiled. Error:", e)
         except ImportError:
             if compile_mode == 'force':
                 raise RuntimeError("Compilation required but Triton not available")
             if compile_mode == 'auto':
                 print("Triton not available, running uncompiled")
 
+    if run is step_eager:
+        out = torch.empty(B, N, N, device=device, dtype=dtype)
+        # Uncompiled: capture the fixed-shape bmm+relu once and replay it, so
+        # each iteration is a single graph launch instead of per-op launches
+        try:
+            stream = torch.cuda.Stream()
+            stream.wait_stream(torch.cuda.current_stream())
+            with torch.cuda.stream(stream):
+                for _ in range(3):
+                    step_eager(A, Bm)
+            torch.cuda.current_stream().wait_stream(stream)
+            graph = torch.cuda.CUDAGraph()
+            with torch.cuda.graph(graph):
+                step_eager(A, Bm)
+
+            # Inputs and output are reused in place, so replay needs no copies
+            def run(a, b):
+                graph.replay()
+                return out
+            print("Captured CUDA graph for the uncompiled step")
+        except Exception as e:
+            print("CUDA graph capture failed, launching ops eagerly. Error:", e)
+
+    # events[i] marks the end of iteration i; events[0] is the start marker
+    events = [torch.cuda.Event(enable_timing=True) for _ in range(iterations + 1)]
+    recorded = 0  # events[1..recorded] have been queued on the stream
+
+    def report_progress():
+        # Poll off the launch thread so progress output never drains the queue
+        for n in range(5, iterations + 1, 5):
+            while n > recorded or not events[n].query():
+                time.sleep(0.005)
+            print(f"Completed {n}/{iterations} iterations")
+
+    progress = threading.Thread(target=report_progress, daemon=True)
+    result = None  # stays None when iterations == 0
     start = time.time()
+    events[0].record()
+    progress.start()
     for i in range(iterations):
         # perform several matmuls per iteration to increase kernel time
-        try:
-            if compiled:
-                out = step_compiled(A, Bm)
-            else:
-                out = step(A, Bm)
-        except Exception as e:
-            # If compiled path fails at runtime, fallback to uncompiled step
-            print("Compiled step failed, falling back to uncompiled. Error:", e)
-            out = step(A, Bm)
-        out = torch.relu(out)
-        if (i+1) % 5 == 0:
-            torch.cuda.synchronize()
-            print(f"Completed {i+1}/{iterations} iterations")
-    torch.cuda.synchronize()
+        result = run(A, Bm)
+        events[i + 1].record()
+        recorded = i + 1
+    events[-1].synchronize()
     elapsed = time.time() - start
+    progress.join()
+    iter_ms = [events[i].elapsed_time(events[i + 1]) for i in range(iterations)]
     print("Elapsed:", elapsed, "s")
-    del A, Bm, out
+    if iter_ms:
+        print(f"GPU time/iteration: mean {sum(iter_ms) / len(iter_ms):.2f} ms, max {max(iter_ms):.2f} ms")
+    # The eager closures still reference out, so it is cleared rather than deleted
+    del A, Bm, result
+    out = None
     torch.cuda.empty_cache()
 
 if __name__ == "__main__":
     args = parse_args()
     heavy_batched_matmul_test(
-        dtype=torch.float16,
         iterations=args.iterations,
         compile_mode=args.compile,
-        target_util=args.target_util
+        target_util=args.target_util,
+        fast_accum=args.fast_accum
     )
@@ -1,33 +1,194 @@
 import argparse
+import signal
 import subprocess
 import time
+import types
 import csv
+import numpy as np
+try:
+    import pynvml
+except ImportError:
+    pynvml = None
 
+# One NVML sample in raw driver units (bytes, milliwatts, MHz). Utilization,
+# power and clock are floats so a field the board does not report
+# (nvidia-smi's [N/A]) can be stored as NaN; in CSV output it is left blank.
+SAMPLE_DTYPE = np.dtype([
+    ('ts', 'f8'),
+    ('util_gpu', 'f4'),
+    ('util_mem', 'f4'),
+    ('mem_used', 'u8'),
+    ('mem_total', 'u8'),
+    ('power_mw', 'f4'),
+    ('gfx_clk', 'f4')
+])
 
-def collect(duration: int, out: str, interval: float = 1.0):
+CSV_HEADER = ['timestamp','index','name','util_gpu','util_mem','mem_used','mem_total','power_draw','gfx_clock']
+
+
+def _format_column(values: np.ndarray, fmt: str) -> np.ndarray:
+    """Format a column of numbers; NaN (unsupported) readings become empty cells."""
+    values = np.asarray(values, dtype=np.float64)
+    missing = np.isnan(values)
+    return np.where(missing, '', np.char.mod(fmt, np.where(missing, 0.0, values)))
+
+
+def _write_samples_csv(samples: np.ndarray, f, index: int, name: str):
+    """Write a block of samples in one call; memory in MiB, power in W."""
+    # index/name are constant per device, so they are written as plain text
+    name = name.replace(',', ' ')
+    cols = [
+        _format_column(samples['ts'], '%.3f'),
+        [str(index)] * len(samples),
+        [name] * len(samples),
+        _format_column(samples['util_gpu'], '%d'),
+        _format_column(samples['util_mem'], '%d'),
+        _format_column(samples['mem_used'] / 1024**2, '%d'),
+        _format_column(samples['mem_total'] / 1024**2, '%d'),
+        _format_column(samples['power_mw'] / 1000.0, '%.2f'),
+        _format_column(samples['gfx_clk'], '%d')
+    ]
+    f.writelines(','.join(row) + '\n' for row in zip(*cols))
+
+
+class NvmlUnavailable(RuntimeError):
+    """NVML could not be initialized or the device handle looked up."""
+
+
+_NO_UTIL = types.SimpleNamespace(gpu=np.nan, memory=np.nan)
+
+
+def _nvml_field(query, *args, default=np.nan):
+    """One NVML query, with default for fields this board does not support."""
+    try:
+        return query(*args)
+    except pynvml.NVMLError_NotSupported:
+        return default
+
+
+def _npy_path(out: str) -> str:
+    """Binary output goes next to the requested path with a .npy suffix."""
+    return out[:-len('.csv')] + '.npy' if out.endswith('.csv') else out
+
+
+def collect_nvml(duration: int, out: str, interval: float = 1.0, flush_every: int = 0,
+                 index: int = 0, as_csv: bool = False):
+    """Sample in-process through NVML into a preallocated structured array.
+
+    The raw samples are saved with np.save (SAMPLE_DTYPE, driver units);
+    with as_csv they are converted to the text format instead. Raises
+    NvmlUnavailable, before touching out, if NVML or the device is missing.
+    """
+    try:
+        pynvml.nvmlInit()
+    except pynvml.NVMLError as e:
+        raise NvmlUnavailable(e) from e
+    try:
+        try:
+            h = pynvml.nvmlDeviceGetHandleByIndex(index)
+        except pynvml.NVMLError as e:
+            raise NvmlUnavailable(e) from e
+        name = pynvml.nvmlDeviceGetName(h)
+        if isinstance(name, bytes):
+            name = name.decode()
+        buf = np.zeros(int(duration / interval) + 8, dtype=SAMPLE_DTYPE)
+        n = written = 0
+        f = open(out, 'w', newline='') if as_csv else None
+        try:
+            if f is not None:
+                f.write(','.join(CSV_HEADER) + '\n')
+            end = time.time() + duration
+            try:
+                while time.time() < end:
+                    if n == len(buf):
+                        buf = np.concatenate([buf, np.zeros_like(buf)])
+                    util = _nvml_field(pynvml.nvmlDeviceGetUtilizationRates, h, default=_NO_UTIL)
+                    mem = pynvml.nvmlDeviceGetMemoryInfo(h)
+                    buf[n] = (
+                        time.time(),
+                        util.gpu,
+                        util.memory,
+                        mem.used,
+                        mem.total,
+                        _nvml_field(pynvml.nvmlDeviceGetPowerUsage, h),
+                        _nvml_field(pynvml.nvmlDeviceGetClockInfo, h, pynvml.NVML_CLOCK_GRAPHICS)
+                    )
+                    n += 1
+                    # Optional periodic checkpoint for crash safety
+                    if flush_every and n - written >= flush_every:
+                        if f is not None:
+                            _write_samples_csv(buf[written:n], f, index, name)
+                            f.flush()
+                        else:
+                            np.save(_npy_path(out), buf[:n])
+                        written = n
+                    time.sleep(interval)
+            except KeyboardInterrupt:
+                pass
+            finally:
+                if f is not None:
+                    _write_samples_csv(buf[written:n], f, index, name)
+                else:
+                    np.save(_npy_path(out), buf[:n])
+        finally:
+            if f is not None:
+                f.close()
+    finally:
+        pynvml.nvmlShutdown()
+
+
+def collect_smi(duration: int, out: str, interval: float = 1.0, flush_every: int = 0):
+    # One long-lived nvidia-smi streaming a CSV row per sample, instead of a
+    # fork/exec per sample
     cmd = [
         'nvidia-smi',
         '--query-gpu=timestamp,index,name,utilization.gpu,utilization.memory,memory.used,memory.total,power.draw,clocks.current.graphics',
-        '--format=csv'
+        '--format=csv',
+        f'--loop-ms={max(1, int(interval * 1000))}'
     ]
     end = time.time() + duration
     with open(out, 'w', newline='') as f:
         writer = csv.writer(f)
-        writer.writerow(['timestamp','index','name','util_gpu','util_mem','mem_used','mem_total','power_draw','gfx_clock'])
-        while time.time() < end:
-            try:
-                p = subprocess.run(cmd, capture_output=True, text=True)
-                lines = p.stdout.strip().splitlines()
-                # skip header
-                for line in lines[1:]:
-                    parts = [x.strip() for x in line.split(',')]
-                    writer.writerow(parts)
-                f.flush()  # Ensure data is written immediately
-            except Exception as e:
-                print('nvidia-smi failed:', e)
-            except Exception as e:
-                print('nvidia-smi failed:', e)
-            time.sleep(interval)
+        writer.writerow(CSV_HEADER)
+        try:
+            p = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True, bufsize=1)
+        except Exception as e:
+            print('nvidia-smi failed:', e)
+            return
+        # Rows are buffered and written in one writerows call at the end
+        rows = []
+        try:
+            while time.time() < end:
+                line = p.stdout.readline()
+                if not line:  # nvidia-smi exited
+                    print('nvidia-smi stopped streaming, exit code:', p.poll())
+                    break
+                # skip header lines and blank separators
+                if 'timestamp' in line or not line.strip():
+                    continue
+                rows.append([x.strip() for x in line.split(',')])
+                # Optional periodic checkpoint for crash safety
+                if flush_every and len(rows) >= flush_every:
+                    writer.writerows(rows)
+                    f.flush()
+                    rows.clear()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            p.terminate()
+            p.wait()
+            writer.writerows(rows)
+
+
+def collect(duration: int, out: str, interval: float = 1.0, flush_every: int = 0,
+            as_csv: bool = False):
+    if pynvml is not None:
+        try:
+            return collect_nvml(duration, out, interval, flush_every, as_csv=as_csv)
+        except NvmlUnavailable as e:
+            print('NVML unavailable, falling back to nvidia-smi:', e)
+    # nvidia-smi already hands us text, so this path always writes CSV
+    collect_smi(duration, out, interval, flush_every)
 
 
 if __name__ == '__main__':
@@ -35,8 +196,15 @@ if __name__ == '__main__':
     parser.add_argument('--duration', type=int, default=30,
                       help='Duration in seconds to collect metrics')
     parser.add_argument('--output', type=str, default='perf_log.csv',
-                      help='Output CSV file path')
+                      help='Output path; NVML samples are saved as .npy unless --csv is given')
     parser.add_argument('--interval', type=float, default=1.0,
                       help='Sampling interval in seconds')
+    parser.add_argument('--flush-every', type=int, default=0,
+                      help='Write buffered samples every N samples (0 = only at exit)')
+    parser.add_argument('--csv', action='store_true',
+                      help='Write NVML samples as CSV text instead of a binary .npy array')
     args = parser.parse_args()
-    collect(args.duration, args.output, args.interval)
+    # run_saturation_demo stops us with terminate(); treat it like Ctrl+C so
+    # buffered samples are still written out
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    collect(args.duration, args.output, args.interval, args.flush_every, args.csv)
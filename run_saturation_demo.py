@@ -11,7 +11,8 @@ def main():
         sys.executable,
         "perf_collector.py",
         "--output", perf_output,
-        "--interval", "0.5"  # Sample every 500ms for granular data
+        "--interval", "0.5",  # Sample every 500ms for granular data
+        "--csv"  # Plain text for plotting; converted once when collection stops
     ])
     
     try:
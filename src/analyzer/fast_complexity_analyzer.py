@@ -1,10 +1,22 @@
 import re
-from typing import Dict, Tuple, Optional
+import functools
+from typing import Dict, List, Tuple, Optional
 from dataclasses import dataclass
 import numpy as np
 import logging
+try:
+    import re2  # Linear-time DFA matcher (google-re2), no backtracking
+    _compile = re2.compile
+except ImportError:
+    # RE2's \w, \b and \d are ASCII-only; re.ASCII makes the stdlib agree,
+    # so scores don't depend on which backend is installed
+    _compile = functools.partial(re.compile, flags=re.ASCII)
+try:
+    from numba import njit, prange  # Optional JIT for large prompt batches
+except ImportError:
+    njit = None
 
-@dataclass
+@dataclass(frozen=True)
 class ComplexityScore:
     raw_score: float
     gpu_power_target: int      # Target power limit in watts
@@ -13,142 +25,244 @@ class ComplexityScore:
     core_clock: int           # Core clock in MHz
     complexity_level: str      # low/medium/high
 
+_LEVELS = ('low', 'medium', 'high')
+
+@dataclass(frozen=True)
+class ComplexityScoreBatch:
+    """Structure-of-arrays form of many ComplexityScore results."""
+    raw_score: np.ndarray
+    gpu_power_target: np.ndarray
+    gpu_util_target: np.ndarray
+    memory_clock: np.ndarray
+    core_clock: np.ndarray
+    level: np.ndarray          # uint8 index into ('low', 'medium', 'high')
+
+    def __len__(self) -> int:
+        return len(self.raw_score)
+
+    def __getitem__(self, i: int) -> ComplexityScore:
+        """Materialize the scalar ComplexityScore for one prompt."""
+        return ComplexityScore(
+            raw_score=float(self.raw_score[i]),
+            gpu_power_target=int(self.gpu_power_target[i]),
+            gpu_util_target=int(self.gpu_util_target[i]),
+            memory_clock=int(self.memory_clock[i]),
+            core_clock=int(self.core_clock[i]),
+            complexity_level=_LEVELS[self.level[i]]
+        )
+
+# Single precompiled scanner: every complexity signal is an alternative
+# of one pattern so a prompt is walked exactly once via finditer.
+_SCAN_PATTERN = _compile(
+    r'(?i)'
+    r'\b(?P<dim1>\d+)[xX×](?P<dim2>\d+)\b'  # Matrix dimensions
+    r'|\b(?P<mem>\d+)\s*(?P<unit>GB|MB|K)\b'  # Memory size
+    r'|\b(?P<ml>train|learning|neural|network|deep|CNN|RNN|LSTM)\b'
+    r'|\b(?P<matrix>matrix|matrices|multiply|multiplication)\b'
+    r'|\b(?P<iter>loop|iterate|epoch|batch|steps?)\b'
+    r'|(?P<num>\d+)'  # Iteration counts
+    r'|(?P<nl>\n)'
+)
+_UNIT_BYTES = {'gb': 1024 * 1024 * 1024, 'mb': 1024 * 1024, 'k': 1024}
+
+# GPU power profiles (example values, adjust based on your GPU)
+POWER_PROFILES = {
+    'low': {
+        'power_limit': 80,    # 80W
+        'gpu_util': 60,       # 60%
+        'memory_clock': 4000,  # 4000MHz
+        'core_clock': 1200    # 1200MHz
+    },
+    'medium': {
+        'power_limit': 150,   # 150W
+        'gpu_util': 85,       # 85%
+        'memory_clock': 6000, # 6000MHz
+        'core_clock': 1600    # 1600MHz
+    },
+    'high': {
+        'power_limit': 250,   # 250W
+        'gpu_util': 100,      # 100%
+        'memory_clock': 7500, # 7500MHz
+        'core_clock': 1900    # 1900MHz
+    }
+}
+
+# Profile columns indexed by level, for vectorized batch lookups
+_POWER_BY_LEVEL = np.array([POWER_PROFILES[l]['power_limit'] for l in _LEVELS])
+_UTIL_BY_LEVEL = np.array([POWER_PROFILES[l]['gpu_util'] for l in _LEVELS])
+_MEMCLK_BY_LEVEL = np.array([POWER_PROFILES[l]['memory_clock'] for l in _LEVELS])
+_CORECLK_BY_LEVEL = np.array([POWER_PROFILES[l]['core_clock'] for l in _LEVELS])
+
+def _scan_prompt(prompt_lower: str) -> Tuple[int, int, int, int]:
+    """Collect all complexity signals in one linear scan.
+
+    Returns:
+        (max_data_size, ml_ops, matrix_ops, max_iterations)
+    """
+    max_size = ml_ops = matrix_ops = max_iterations = 0
+    # An iteration keyword counts the first number following it on the same line
+    pending_iter = False
+    for match in _SCAN_PATTERN.finditer(prompt_lower):
+        kind = match.lastgroup
+        number = None
+        if kind == 'dim2':  # Matrix dimensions
+            number = int(match.group('dim1'))
+            max_size = max(max_size, number * int(match.group('dim2')))
+        elif kind == 'unit':  # Memory size
+            number = int(match.group('mem'))
+            max_size = max(max_size, number * _UNIT_BYTES[match.group('unit')])
+        elif kind == 'num':
+            number = int(match.group('num'))
+        elif kind == 'ml':
+            ml_ops += 1
+        elif kind == 'matrix':
+            matrix_ops += 1
+        elif kind == 'iter':
+            pending_iter = True
+        else:  # Newline ends any pending iteration clause
+            pending_iter = False
+
+        if pending_iter and number is not None:
+            max_iterations = max(max_iterations, number)
+            pending_iter = False
+
+    return max_size, ml_ops, matrix_ops, max_iterations
+
+def _analyze_data_size(max_size: int) -> float:
+    """Quickly estimate data size complexity."""
+    # Normalize size score
+    if max_size < 1024 * 1024:  # < 1MB (or no size specified)
+        return 0.3
+    elif max_size < 1024 * 1024 * 1024:  # < 1GB
+        return 0.6
+    else:
+        return 0.9
+
+def _analyze_operation_complexity(ml_ops: int, matrix_ops: int) -> float:
+    """Quickly estimate computational complexity."""
+    # Weight the operations
+    score = (ml_ops * 0.4 + matrix_ops * 0.3) / 5.0  # Normalize to 0-1
+    return min(score, 1.0)
+
+def _analyze_iterations(max_iterations: int) -> float:
+    """Estimate complexity based on iteration counts."""
+    # Normalize iteration score
+    if max_iterations < 100:
+        return 0.3
+    elif max_iterations < 1000:
+        return 0.6
+    else:
+        return 0.9
+
+@functools.lru_cache(maxsize=512)
+def _analyze_prompt_cached(prompt: str) -> ComplexityScore:
+    """Pure prompt -> ComplexityScore mapping, memoized for repeated prompts."""
+    # Fast complexity analysis: lowercase once, scan once
+    max_size, ml_ops, matrix_ops, max_iterations = _scan_prompt(prompt.lower())
+    data_score = _analyze_data_size(max_size)
+    op_score = _analyze_operation_complexity(ml_ops, matrix_ops)
+    iter_score = _analyze_iterations(max_iterations)
+
+    # Weighted combination for final score
+    final_score = (
+        data_score * 0.4 +    # Data size is most important
+        op_score * 0.35 +     # Operation complexity next
+        iter_score * 0.25     # Iterations least important
+    )
+
+    # Determine complexity level and power profile
+    if final_score < 0.4:
+        level = 'low'
+    elif final_score < 0.7:
+        level = 'medium'
+    else:
+        level = 'high'
+    profile = POWER_PROFILES[level]
+
+    return ComplexityScore(
+        raw_score=final_score,
+        gpu_power_target=profile['power_limit'],
+        gpu_util_target=profile['gpu_util'],
+        memory_clock=profile['memory_clock'],
+        core_clock=profile['core_clock'],
+        complexity_level=level
+    )
+
+def _score_features_numpy(features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(n, 4) scan features -> (final_score, level) with NumPy array ops."""
+    max_size, ml_ops, matrix_ops, max_iterations = features.T
+    data_score = np.where(max_size < 1024 * 1024, 0.3,
+                          np.where(max_size < 1024 * 1024 * 1024, 0.6, 0.9))
+    op_score = np.minimum((ml_ops * 0.4 + matrix_ops * 0.3) / 5.0, 1.0)
+    iter_score = np.where(max_iterations < 100, 0.3,
+                          np.where(max_iterations < 1000, 0.6, 0.9))
+
+    final_score = data_score * 0.4 + op_score * 0.35 + iter_score * 0.25
+    level = np.where(final_score < 0.4, 0, np.where(final_score < 0.7, 1, 2)).astype(np.uint8)
+    return final_score, level
+
+if njit is not None:
+    # No fastmath: reassociating the weighted sum could move a score across
+    # a tier threshold and disagree with analyze_prompt
+    @njit(parallel=True, cache=True)
+    def _score_features_kernel(features, out_score, out_level):
+        for i in prange(features.shape[0]):
+            max_size = features[i, 0]
+            if max_size < 1024 * 1024:
+                data_score = 0.3
+            elif max_size < 1024 * 1024 * 1024:
+                data_score = 0.6
+            else:
+                data_score = 0.9
+            op_score = min((features[i, 1] * 0.4 + features[i, 2] * 0.3) / 5.0, 1.0)
+            max_iterations = features[i, 3]
+            if max_iterations < 100:
+                iter_score = 0.3
+            elif max_iterations < 1000:
+                iter_score = 0.6
+            else:
+                iter_score = 0.9
+
+            score = data_score * 0.4 + op_score * 0.35 + iter_score * 0.25
+            out_score[i] = score
+            out_level[i] = 0 if score < 0.4 else (1 if score < 0.7 else 2)
+
+    def _score_features(features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(n, 4) scan features -> (final_score, level) in one parallel pass."""
+        final_score = np.empty(len(features), dtype=np.float64)
+        level = np.empty(len(features), dtype=np.uint8)
+        _score_features_kernel(features, final_score, level)
+        return final_score, level
+else:
+    _score_features = _score_features_numpy
+
+def _score_batch(features: np.ndarray) -> ComplexityScoreBatch:
+    """Batch scoring of (n, 4) scan features; mirrors _analyze_prompt_cached."""
+    final_score, level = _score_features(features)
+
+    return ComplexityScoreBatch(
+        raw_score=final_score,
+        gpu_power_target=_POWER_BY_LEVEL[level],
+        gpu_util_target=_UTIL_BY_LEVEL[level],
+        memory_clock=_MEMCLK_BY_LEVEL[level],
+        core_clock=_CORECLK_BY_LEVEL[level],
+        level=level
+    )
+
 class FastComplexityAnalyzer:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
-        
-        # Initialize pattern matchers for quick analysis
-        self.complexity_patterns = {
-            'matrix_ops': r'\b(matrix|matrices|multiply|multiplication)\b',
-            'ml_ops': r'\b(train|learning|neural|network|deep|CNN|RNN|LSTM)\b',
-            'data_size': r'\b(\d+)[xX×](\d+)\b|\b(\d+)\s*(GB|MB|K)\b',
-            'iterations': r'\b(loop|iterate|epoch|batch|steps?)\b.*?(\d+)',
-            'precision': r'\b(float64|double|float32|float16|half|int8|fp16|fp32)\b'
-        }
-        
-        # GPU power profiles (example values, adjust based on your GPU)
-        self.power_profiles = {
-            'low': {
-                'power_limit': 80,    # 80W
-                'gpu_util': 60,       # 60%
-                'memory_clock': 4000,  # 4000MHz
-                'core_clock': 1200    # 1200MHz
-            },
-            'medium': {
-                'power_limit': 150,   # 150W
-                'gpu_util': 85,       # 85%
-                'memory_clock': 6000, # 6000MHz
-                'core_clock': 1600    # 1600MHz
-            },
-            'high': {
-                'power_limit': 250,   # 250W
-                'gpu_util': 100,      # 100%
-                'memory_clock': 7500, # 7500MHz
-                'core_clock': 1900    # 1900MHz
-            }
-        }
-
-    def _analyze_data_size(self, prompt: str) -> float:
-        """Quickly estimate data size complexity."""
-        matches = re.findall(self.complexity_patterns['data_size'], prompt.lower())
-        if not matches:
-            return 0.3  # Default to low if no size specified
-            
-        max_size = 0
-        for match in matches:
-            if match[0] and match[1]:  # Matrix dimensions
-                size = int(match[0]) * int(match[1])
-                max_size = max(max_size, size)
-            elif match[2] and match[3]:  # Memory size
-                size_str = match[3].upper()
-                size = int(match[2])
-                if 'GB' in size_str:
-                    size *= 1024 * 1024 * 1024
-                elif 'MB' in size_str:
-                    size *= 1024 * 1024
-                elif 'K' in size_str:
-                    size *= 1024
-                max_size = max(max_size, size)
-        
-        # Normalize size score
-        if max_size == 0:
-            return 0.3
-        elif max_size < 1024 * 1024:  # < 1MB
-            return 0.3
-        elif max_size < 1024 * 1024 * 1024:  # < 1GB
-            return 0.6
-        else:
-            return 0.9
-
-    def _analyze_operation_complexity(self, prompt: str) -> float:
-        """Quickly estimate computational complexity."""
-        prompt_lower = prompt.lower()
-        
-        # Count complex operations
-        ml_ops = len(re.findall(self.complexity_patterns['ml_ops'], prompt_lower))
-        matrix_ops = len(re.findall(self.complexity_patterns['matrix_ops'], prompt_lower))
-        
-        # Weight the operations
-        score = (ml_ops * 0.4 + matrix_ops * 0.3) / 5.0  # Normalize to 0-1
-        return min(score, 1.0)
-
-    def _analyze_iterations(self, prompt: str) -> float:
-        """Estimate complexity based on iteration counts."""
-        matches = re.findall(self.complexity_patterns['iterations'], prompt.lower())
-        if not matches:
-            return 0.3
-            
-        max_iterations = 0
-        for match in matches:
-            if match[1].isdigit():
-                max_iterations = max(max_iterations, int(match[1]))
-        
-        # Normalize iteration score
-        if max_iterations < 100:
-            return 0.3
-        elif max_iterations < 1000:
-            return 0.6
-        else:
-            return 0.9
+        self.power_profiles = POWER_PROFILES
 
     def analyze_prompt(self, prompt: str) -> ComplexityScore:
         """
         Quickly analyze prompt complexity and determine GPU power settings.
-        This method is optimized for speed and efficiency.
+        This method is optimized for speed and efficiency; repeated prompts
+        are served from an LRU cache.
         """
         try:
-            # Fast complexity analysis
-            data_score = self._analyze_data_size(prompt)
-            op_score = self._analyze_operation_complexity(prompt)
-            iter_score = self._analyze_iterations(prompt)
-            
-            # Weighted combination for final score
-            final_score = (
-                data_score * 0.4 +    # Data size is most important
-                op_score * 0.35 +     # Operation complexity next
-                iter_score * 0.25     # Iterations least important
-            )
-            
-            # Determine complexity level and power profile
-            if final_score < 0.4:
-                profile = self.power_profiles['low']
-                level = 'low'
-            elif final_score < 0.7:
-                profile = self.power_profiles['medium']
-                level = 'medium'
-            else:
-                profile = self.power_profiles['high']
-                level = 'high'
-                
-            return ComplexityScore(
-                raw_score=final_score,
-                gpu_power_target=profile['power_limit'],
-                gpu_util_target=profile['gpu_util'],
-                memory_clock=profile['memory_clock'],
-                core_clock=profile['core_clock'],
-                complexity_level=level
-            )
-            
+            return _analyze_prompt_cached(prompt)
+
         except Exception as e:
             self.logger.error(f"Error analyzing prompt complexity: {e}")
             # Return safe default values if analysis fails
@@ -159,4 +273,16 @@ class FastComplexityAnalyzer:
                 memory_clock=4000,
                 core_clock=1200,
                 complexity_level='low'
-            )
\ No newline at end of file
+            )
+
+    def analyze_prompts(self, prompts: List[str]) -> ComplexityScoreBatch:
+        """Analyze many prompts at once.
+
+        Each prompt is still scanned individually, but scoring and profile
+        selection run as a handful of NumPy operations over the whole batch.
+        """
+        # float64 so oversized data sizes compare correctly instead of overflowing
+        features = np.array(
+            [_scan_prompt(prompt.lower()) for prompt in prompts], dtype=np.float64
+        ).reshape(-1, 4)
+        return _score_batch(features)
@@ -1,13 +1,16 @@
 """Core GPU governor components."""
 from .analyzer import ComplexityAnalyzer
-from .precision import PrecisionManager, EnergyMetrics
+from .precision import PrecisionManager, EnergyMetrics, EnergyMetricsBatch, estimate_savings
 from .telemetry import TelemetryManager
-from .gpu_controller import GPUGovernor
+from .gpu_controller import GPUGovernor, replay_joules_saved
 
 __all__ = [
     'ComplexityAnalyzer',
     'PrecisionManager',
     'EnergyMetrics',
+    'EnergyMetricsBatch',
+    'estimate_savings',
     'TelemetryManager',
-    'GPUGovernor'
+    'GPUGovernor',
+    'replay_joules_saved'
 ]
\ No newline at end of file
@@ -1,6 +1,7 @@
 """Complexity analysis for GPU workloads."""
 import re
 from typing import Dict, Optional
+import numpy as np
 
 class ComplexityAnalyzer:
     """Analyzes input prompts to estimate computational complexity."""
@@ -14,6 +15,15 @@ class ComplexityAnalyzer:
         'memory': 0.15     # Memory intensity
     }
     
+    # Memory intensity signals, highest first so the first hit is the score
+    MEMORY_INDICATORS = {
+        'huge': 1.0,
+        'memory intensive': 0.9,
+        'large': 0.8,
+        'small': 0.2,
+        'tiny': 0.1
+    }
+    
     def __init__(self):
         # Precompile regex patterns
         self.matrix_pattern = re.compile(r'(\d+)\s*[xX]\s*(\d+)')
@@ -22,12 +32,14 @@ class ComplexityAnalyzer:
     
     def analyze(self, prompt: str) -> Dict[str, float]:
         """Analyze prompt and return complexity scores per component."""
+        # Normalize once; every helper works on the lowercased prompt
+        p_lower = prompt.lower()
         scores = {
-            'matrix_ops': self._analyze_matrix_ops(prompt),
-            'batch_size': self._analyze_batch_size(prompt),
-            'iterations': self._analyze_iterations(prompt),
-            'precision': self._analyze_precision_needs(prompt),
-            'memory': self._analyze_memory_intensity(prompt)
+            'matrix_ops': self._analyze_matrix_ops(p_lower),
+            'batch_size': self._analyze_batch_size(p_lower),
+            'iterations': self._analyze_iterations(p_lower),
+            'precision': self._analyze_precision_needs(p_lower),
+            'memory': self._analyze_memory_intensity(p_lower)
         }
         return scores
     
@@ -40,59 +52,48 @@ class ComplexityAnalyzer:
         )
         return min(1.0, max(0.0, weighted_sum))
     
-    def _analyze_matrix_ops(self, prompt: str) -> float:
+    def _analyze_matrix_ops(self, p_lower: str) -> float:
         """Analyze matrix operation complexity."""
-        matches = self.matrix_pattern.findall(prompt.lower())
-        if not matches:
+        # One (k, 2) array and a C-level reduce instead of k Python int products;
+        # float64 so absurd sizes saturate instead of overflowing
+        dims = np.array(self.matrix_pattern.findall(p_lower), dtype=np.float64)
+        if dims.size == 0:
             return 0.0
-        max_size = max(
-            int(n) * int(m)
-            for n, m in matches
-        )
+        max_size = float(dims.prod(axis=1).max())
         # Normalize: assume 4096x4096 is max complexity
         return min(1.0, max_size / (4096 * 4096))
     
-    def _analyze_batch_size(self, prompt: str) -> float:
+    def _analyze_batch_size(self, p_lower: str) -> float:
         """Analyze batch processing complexity."""
-        match = self.batch_pattern.search(prompt)
+        match = self.batch_pattern.search(p_lower)
         if not match:
             return 0.0
         size = int(match.group(1))
         # Normalize: assume batch_size=32 is max complexity
         return min(1.0, size / 32.0)
     
-    def _analyze_iterations(self, prompt: str) -> float:
+    def _analyze_iterations(self, p_lower: str) -> float:
         """Analyze iteration/loop complexity."""
-        match = self.iter_pattern.search(prompt)
+        match = self.iter_pattern.search(p_lower)
         if not match:
             return 0.0
         iters = int(match.group(1))
         # Normalize: assume 1000 iterations is max complexity
         return min(1.0, iters / 1000.0)
     
-    def _analyze_precision_needs(self, prompt: str) -> float:
+    def _analyze_precision_needs(self, p_lower: str) -> float:
         """Analyze precision requirements."""
-        prompt = prompt.lower()
-        if 'high precision' in prompt or 'fp32' in prompt:
+        if 'high precision' in p_lower or 'fp32' in p_lower:
             return 1.0
-        if 'mixed precision' in prompt or 'fp16' in prompt:
+        if 'mixed precision' in p_lower or 'fp16' in p_lower:
             return 0.5
-        if 'low precision' in prompt or 'int8' in prompt:
+        if 'low precision' in p_lower or 'int8' in p_lower:
             return 0.2
         return 0.5  # Default to medium precision needs
     
-    def _analyze_memory_intensity(self, prompt: str) -> float:
+    def _analyze_memory_intensity(self, p_lower: str) -> float:
         """Analyze memory intensity signals."""
-        prompt = prompt.lower()
-        score = 0.0
-        memory_indicators = {
-            'large': 0.8,
-            'huge': 1.0,
-            'memory intensive': 0.9,
-            'small': 0.2,
-            'tiny': 0.1
-        }
-        for indicator, value in memory_indicators.items():
-            if indicator in prompt:
-                score = max(score, value)
-        return score or 0.5  # Default to medium if no signals
\ No newline at end of file
+        for indicator, value in self.MEMORY_INDICATORS.items():
+            if indicator in p_lower:
+                return value
+        return 0.5  # Default to medium if no signals
\ No newline at end of file
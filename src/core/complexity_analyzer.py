@@ -1,17 +1,107 @@
 import re
 import math
+import functools
 from typing import Tuple
+import numpy as np
+try:
+    import re2  # Linear-time DFA matcher (google-re2), no backtracking
+    _compile = re2.compile
+except ImportError:
+    # RE2's \w, \b and \d are ASCII-only; re.ASCII makes the stdlib agree,
+    # so scores don't depend on which backend is installed
+    _compile = functools.partial(re.compile, flags=re.ASCII)
+try:
+    import ahocorasick  # pyahocorasick, optional C multi-pattern matcher
+except ImportError:
+    ahocorasick = None
 
 # Lightweight complexity estimator
 
+# Patterns are compiled once at import time
+_TOKEN_RE = _compile(r"\w+")
+_MATRIX_RE = _compile(r"(\d{1,6})\s*[x×]\s*(\d{1,6})")
+_BATCH_RE = _compile(r"(?:batch\s*size|bs)\s*[:=]?\s*(\d{1,6})")
+
+# operation keywords as (literal, score, whole_word). Whole-word keywords need
+# a non-word character or the string edge on both sides, like r"\bkw\b";
+# prefixes such as "simulat" are only bounded on the left.
+_KEYWORDS: Tuple[Tuple[str, float, bool], ...] = (
+    ("train", 0.9, True),
+    ("backprop", 0.95, True),
+    ("convolution", 0.8, True),
+    ("fft", 0.7, True),
+    ("render", 0.9, True),
+    ("ray-trace", 1.0, True),
+    ("ray trace", 1.0, True),
+    ("inference", 0.5, True),
+    ("simulat", 0.8, False),
+    ("optimise", 0.6, True),
+    ("optimize", 0.6, True),
+    ("add", 0.05, True),
+    ("mean", 0.05, True)
+)
+
+# No later hit can beat this, so scanning stops once it is reached
+_MAX_KEYWORD_SCORE = max(score for _, score, _ in _KEYWORDS)
+
+# Fallback scanner: all keywords fused into a single alternation; a hit is
+# scored by the index of the group that matched
+_KEYWORD_RE = _compile("|".join(
+    r"(\b%s%s)" % (re.escape(kw), r"\b" if whole else "")
+    for kw, _, whole in _KEYWORDS
+))
+
+# Preferred scanner: one Aho-Corasick automaton finds every keyword hit in a
+# single C-level pass over the prompt
+if ahocorasick is not None:
+    _KEYWORD_AUTOMATON = ahocorasick.Automaton()
+    for _kw, _score, _whole in _KEYWORDS:
+        _KEYWORD_AUTOMATON.add_word(_kw, (len(_kw), _score, _whole))
+    _KEYWORD_AUTOMATON.make_automaton()
+else:
+    _KEYWORD_AUTOMATON = None
+
+
+def _is_word_char(c: str) -> bool:
+    # ASCII-only, like \w in the compiled patterns
+    return c.isascii() and (c.isalnum() or c == '_')
+
+
+def _keyword_score(s: str) -> float:
+    """Highest operation-keyword score found in the lowercased prompt."""
+    op_score = 0.0
+    if _KEYWORD_AUTOMATON is not None:
+        last = len(s) - 1
+        for end, (length, score, whole) in _KEYWORD_AUTOMATON.iter(s):
+            start = end - length + 1
+            # Enforce the word boundaries the regex form expresses with \b
+            if start > 0 and _is_word_char(s[start - 1]):
+                continue
+            if whole and end < last and _is_word_char(s[end + 1]):
+                continue
+            op_score = max(op_score, score)
+            if op_score == _MAX_KEYWORD_SCORE:
+                break
+        return op_score
+
+    for m in _KEYWORD_RE.finditer(s):
+        op_score = max(op_score, _KEYWORDS[m.lastindex - 1][1])
+        if op_score == _MAX_KEYWORD_SCORE:
+            break
+    return op_score
+
 def _norm_log(x: float, base: float = 1024.0, cap: float = 1e12) -> float:
     x = min(max(x, 0.0), cap)
     return min(1.0, math.log(x + 1, base + 1))
 
 
+@functools.lru_cache(maxsize=512)
 def estimate_complexity(prompt: str) -> float:
     """Return a complexity score in [0,1] quickly.
 
+    Results are memoized per prompt string, so repeated prompts cost a
+    cache lookup.
+
     Components:
     - token factor (context length)
     - size factor (NxM matrices or data sizes / batch sizes)
@@ -22,18 +112,17 @@ def estimate_complexity(prompt: str) -> float:
     s = prompt.lower()
 
     # token factor
-    tokens = re.findall(r"\w+", s)
-    token_count = len(tokens)
+    token_count = len(_TOKEN_RE.findall(s))
     token_factor = min(1.0, token_count / 2000.0)
 
     # matrix / data size detection
+    # _norm_log is monotonic, so only the largest area needs normalizing
     matrix_factor = 0.0
-    for m in re.finditer(r"(\d{1,6})\s*[x×]\s*(\d{1,6})", s):
-        a, b = int(m.group(1)), int(m.group(2))
-        area = a * b
-        matrix_factor = max(matrix_factor, _norm_log(area, base=4096.0))
+    dims = np.array(_MATRIX_RE.findall(s), dtype=np.float64)
+    if dims.size:
+        matrix_factor = _norm_log(float(dims.prod(axis=1).max()), base=4096.0)
 
-    bs = re.search(r"(?:batch\s*size|bs)\s*[:=]?\s*(\d{1,6})", s)
+    bs = _BATCH_RE.search(s)
     batch_factor = 0.0
     if bs:
         batch_factor = _norm_log(int(bs.group(1)), base=256.0)
@@ -41,23 +130,7 @@ def estimate_complexity(prompt: str) -> float:
     size_factor = max(matrix_factor, batch_factor)
 
     # operation keywords
-    keywords = {
-        r"\btrain\b": 0.9,
-        r"\bbackprop\b": 0.95,
-        r"\bconvolution\b": 0.8,
-        r"\bfft\b": 0.7,
-        r"\brender\b": 0.9,
-        r"\bray[- ]trace\b": 1.0,
-        r"\binference\b": 0.5,
-        r"\bsimulat": 0.8,
-        r"\boptimi[sz]e\b": 0.6,
-        r"\badd\b": 0.05,
-        r"\bmean\b": 0.05
-    }
-    op_score = 0.0
-    for patt, score in keywords.items():
-        if re.search(patt, s):
-            op_score = max(op_score, score)
+    op_score = _keyword_score(s)
 
     final = 0.5 * op_score + 0.35 * size_factor + 0.15 * token_factor
     final = max(0.0, min(1.0, final))
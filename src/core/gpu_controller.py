@@ -1,16 +1,19 @@
 """Main GPU governor coordinating complexity analysis, precision selection, and monitoring."""
+import os
 import time
 import logging
-from dataclasses import dataclass
+from collections import deque
+from dataclasses import dataclass, field
 from typing import Dict, Tuple, List, Optional
+import numpy as np
 import torch
 try:
-    import pynvml
+    from numba import njit, prange  # Optional JIT for long history replays
 except ImportError:
-    pynvml = None
+    njit = None
 
 from .analyzer import ComplexityAnalyzer
-from .precision import PrecisionManager, EnergyMetrics
+from .precision import PrecisionManager, EnergyMetrics, EnergyMetricsBatch
 from .telemetry import TelemetryManager
 
 
@@ -26,6 +29,177 @@ class GPUState:
     performance_state: str
 
 
+_LOG_COLUMNS = (
+    'ts', 'complexity', 'power_saved', 'memory_saved', 'energy_saved',
+    'duration', 'power_actual'
+)
+
+
+def _joules_saved_numpy(duration, power_actual, power_saved_percent, baseline_power):
+    saved_watts = np.where(
+        np.isnan(power_actual),
+        baseline_power * power_saved_percent / 100.0,
+        baseline_power - power_actual
+    )
+    return float(np.nansum(np.maximum(saved_watts, 0.0) * duration))
+
+# Below this many records the NumPy path is already sub-millisecond and a
+# first-call JIT compile would dominate. Far above the governor's 10k ring:
+# only offline replays of long sessions get here.
+_JIT_MIN_RECORDS = 100_000
+
+if njit is not None:
+    # No fastmath: it lets the compiler assume NaN never occurs, and NaN
+    # marks unknown values here
+    @njit(parallel=True, cache=True)
+    def _joules_saved_kernel(duration, power_actual, power_saved_percent, baseline_power):
+        total = 0.0
+        for i in prange(duration.shape[0]):
+            if np.isnan(power_actual[i]):
+                saved = baseline_power * power_saved_percent[i] / 100.0
+            else:
+                saved = baseline_power - power_actual[i]
+            if np.isnan(saved) or np.isnan(duration[i]):
+                continue
+            total += max(saved, 0.0) * duration[i]
+        return total
+
+def replay_joules_saved(
+    duration,
+    power_actual,
+    power_saved_percent,
+    baseline_power: float = 100.0
+) -> float:
+    """Total energy saved (J) over an offline replay of per-run records.
+
+    Takes parallel arrays, e.g. TelemetryLog columns concatenated across a
+    long session. Measured power is used where known, otherwise the
+    estimated savings percentage against baseline_power; rows with NaN
+    duration are skipped. Large replays run in a parallel numba kernel
+    when numba is installed.
+    """
+    duration = np.asarray(duration, dtype=np.float64)
+    power_actual = np.asarray(power_actual, dtype=np.float64)
+    power_saved_percent = np.asarray(power_saved_percent, dtype=np.float64)
+    if njit is not None and len(duration) >= _JIT_MIN_RECORDS:
+        return float(_joules_saved_kernel(
+            duration, power_actual, power_saved_percent, float(baseline_power)
+        ))
+    return _joules_saved_numpy(duration, power_actual, power_saved_percent, baseline_power)
+
+
+@dataclass
+class TelemetryLog:
+    """Optimization history stored as parallel columns (structure of arrays).
+
+    Each record is a timestamp and complexity plus, for precision decisions,
+    the chosen tier and its savings, and, once the workload has run, its
+    duration and measured power. Unknown values are NaN.
+
+    Storage is a fixed-capacity ring: once maxlen records are held, each
+    append overwrites the oldest, so a long-running governor stays at
+    constant memory.
+    """
+    maxlen: int = 10_000
+    _data: np.ndarray = field(init=False, repr=False)
+    _chosen_fp: np.ndarray = field(init=False, repr=False)
+    _head: int = field(default=0, init=False, repr=False)
+    _count: int = field(default=0, init=False, repr=False)
+
+    def __post_init__(self):
+        # One row per column in _LOG_COLUMNS, one slot per record
+        self._data = np.full((len(_LOG_COLUMNS), self.maxlen), np.nan)
+        self._chosen_fp = np.full(self.maxlen, None, dtype=object)
+
+    def append(
+        self,
+        timestamp: float,
+        complexity: float,
+        chosen_fp: Optional[str] = None,
+        power_saved_percent: float = float('nan'),
+        memory_saved_percent: float = float('nan'),
+        energy_saved: float = float('nan')
+    ):
+        self._data[:, self._head] = (
+            timestamp, complexity, power_saved_percent, memory_saved_percent, energy_saved,
+            np.nan, np.nan
+        )
+        self._chosen_fp[self._head] = chosen_fp
+        self._head = (self._head + 1) % self.maxlen
+        self._count = min(self._count + 1, self.maxlen)
+
+    def extend(
+        self,
+        timestamp: float,
+        complexity: np.ndarray,
+        chosen_fp: np.ndarray,
+        power_saved_percent: np.ndarray,
+        memory_saved_percent: np.ndarray,
+        energy_saved: np.ndarray
+    ):
+        """Append many records at once; scalar arguments broadcast."""
+        complexity = np.asarray(complexity, dtype=np.float64)
+        n = len(complexity)
+        rows = np.full((len(_LOG_COLUMNS), n), np.nan)
+        rows[0] = timestamp
+        rows[1] = complexity
+        rows[2] = power_saved_percent
+        rows[3] = memory_saved_percent
+        rows[4] = energy_saved
+        chosen = np.broadcast_to(np.asarray(chosen_fp, dtype=object), (n,))
+        if n > self.maxlen:  # only the newest maxlen survive anyway
+            rows, chosen = rows[:, -self.maxlen:], chosen[-self.maxlen:]
+        written = rows.shape[1]
+        slots = (self._head + np.arange(written)) % self.maxlen
+        self._data[:, slots] = rows
+        self._chosen_fp[slots] = chosen
+        self._head = (self._head + written) % self.maxlen
+        self._count = min(self._count + n, self.maxlen)
+
+    def record_run(self, duration: float, power_actual: Optional[float], energy_saved: float):
+        """Attach a run (seconds, watts if measured, joules saved) to the newest record."""
+        slot = self._slot(-1)
+        self._data[_LOG_COLUMNS.index('duration'), slot] = duration
+        self._data[_LOG_COLUMNS.index('power_actual'), slot] = (
+            np.nan if power_actual is None else power_actual
+        )
+        self._data[_LOG_COLUMNS.index('energy_saved'), slot] = energy_saved
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _slot(self, i: int) -> int:
+        """Ring slot of the i-th oldest record (negative i counts from the end)."""
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError('TelemetryLog index out of range')
+        return (self._head - self._count + i) % self.maxlen
+
+    def __getitem__(self, i: int) -> Dict:
+        """One record in the dict form earlier releases stored."""
+        slot = self._slot(i)
+        ts, complexity, power, memory, energy, duration, power_actual = self._data[:, slot].tolist()
+        record = {'timestamp': ts, 'complexity': complexity}
+        if self._chosen_fp[slot] is not None:
+            record.update(
+                chosen_fp=self._chosen_fp[slot],
+                power_saved_percent=power,
+                memory_saved_percent=memory,
+                energy_saved=energy,
+                duration=duration,
+                power_actual=power_actual
+            )
+        return record
+
+    def column(self, name: str) -> np.ndarray:
+        """One numeric column in chronological order, e.g. 'complexity'."""
+        row = self._data[_LOG_COLUMNS.index(name)]
+        if self._count < self.maxlen:
+            return row[:self._count].copy()
+        return np.concatenate((row[self._head:], row[:self._head]))
+
+
 class GPUGovernor:
     """Energy-efficient GPU governor that automatically selects optimal floating-point 
     precision based on prompt complexity analysis. The primary goal is to minimize 
@@ -40,9 +214,18 @@ class GPUGovernor:
     3. Track and report energy/resource savings
     """
 
+    # Idle allocator cache (MB) worth a synchronizing empty_cache() in cleanup
+    CLEANUP_THRESHOLD_MB = 256
+
     def __init__(self, gpu_id: int = 0):
         self.logger = logging.getLogger(__name__)
         self.gpu_id = gpu_id
+        # Let the caching allocator grow segments in place instead of
+        # fragmenting, so freed memory is reusable without empty_cache().
+        # The variable is only read when CUDA initializes, so it is left
+        # alone once CUDA is up; an explicit user setting always wins.
+        if not torch.cuda.is_initialized():
+            os.environ.setdefault('PYTORCH_CUDA_ALLOC_CONF', 'expandable_segments:True')
         
         # Initialize components
         self.analyzer = ComplexityAnalyzer()
@@ -50,8 +233,9 @@ class GPUGovernor:
         self.telemetry = TelemetryManager(gpu_id)
         
         self.current_fp_tier = 'fp32'
-        self.monitoring_history = []
-        self.energy_metrics = []  # Track energy savings over time
+        # Bounded: a long-running governor keeps the most recent records only
+        self.monitoring_history = TelemetryLog(maxlen=10_000)
+        self.energy_metrics = deque(maxlen=10_000)  # Track energy savings over time
         self.baseline_power = 100.0  # Assumed baseline power draw for FP32 (watts)
 
     def _get_gpu_state(self) -> Optional[GPUState]:
@@ -62,21 +246,13 @@ class GPUGovernor:
         """Determine performance state based on utilization."""
         return self.telemetry.determine_performance_state(utilization)
 
-    def optimize_for_workload(self, workload_complexity: float):
-        """Apply runtime optimizations based on workload complexity."""
-        try:
-            self.precision.optimize_for_workload(workload_complexity)
-
-            state = self._get_gpu_state()
-            if state:
-                self.monitoring_history.append({
-                    'timestamp': time.time(),
-                    'complexity': float(workload_complexity),
-                'state': state
-            })
-            self.logger.info(f"Optimized for complexity={workload_complexity:.2f}")
-        except Exception as e:
-            self.logger.error(f"Error during optimization: {e}")
+    def optimize_for_workload(self, workload_complexity: float) -> Tuple[str, EnergyMetrics]:
+        """Apply runtime optimizations based on workload complexity.
+
+        Older name for apply_fp_for_workload(workload_complexity), the
+        canonical per-workload entry point; kept for existing callers.
+        """
+        return self.apply_fp_for_workload(workload_complexity)
 
     def get_current_metrics(self) -> Dict[str, str]:
         state = self._get_gpu_state()
@@ -92,82 +268,78 @@ class GPUGovernor:
     def get_optimization_history(self) -> Dict:
         if not self.monitoring_history:
             return {}
-        import numpy as _np
-        arr = _np.array([(x['timestamp'], x['complexity']) for x in self.monitoring_history])
+        complexity = self.monitoring_history.column('complexity')
         return {
-            'timestamps': arr[:,0].tolist(),
-            'complexity_values': arr[:,1].tolist(),
+            'timestamps': self.monitoring_history.column('ts').tolist(),
+            'complexity_values': complexity.tolist(),
             'total_optimizations': len(self.monitoring_history),
-            'average_complexity': float(_np.mean(arr[:,1]))
+            'average_complexity': float(complexity.mean())
         }
 
     def cleanup(self):
+        """Return cached GPU memory to the driver if enough of it is idle.
+
+        empty_cache() synchronizes the device, so it only runs when the
+        allocator holds more than CLEANUP_THRESHOLD_MB of unused memory.
+        """
         try:
-            torch.cuda.empty_cache()
-            self.logger.info("GPU resources cleaned up")
+            idle = torch.cuda.memory_reserved() - torch.cuda.memory_allocated()
+            if idle > self.CLEANUP_THRESHOLD_MB * 1024**2:
+                torch.cuda.empty_cache()
+                self.logger.info(f"GPU resources cleaned up ({idle / 1024**2:.0f}MB released)")
         except Exception as e:
             self.logger.error(f"Error during cleanup: {e}")
 
     # --- Floating point precision mapping and context ---
-    def map_complexity_to_fp(self, complexity: float) -> Tuple[str, EnergyMetrics]:
+    def map_complexity_to_fp(
+        self,
+        complexity: float,
+        batch_size: Optional[int] = None,
+        param_count: Optional[int] = None,
+        seq_len: Optional[int] = None
+    ) -> Tuple[str, EnergyMetrics]:
         """Map complexity score to most energy-efficient FP precision.
         
         Returns:
             Tuple[str, EnergyMetrics]: Selected FP tier and estimated energy savings
         
-        Strategy:
-        - Low complexity -> FP16 (maximum energy savings)
-        - Medium complexity -> FP16 (balanced)
+        Strategy (FP4 < FP8 < FP16 < FP32):
+        - Lowest complexity -> FP4/FP8, but only when the GPU has the tensor
+          cores for it and the workload (batch size, model size) saturates
+          them; otherwise 16-bit
+        - Medium complexity -> 16-bit (balanced): BF16 on Ampere+, else FP16
         - High complexity -> FP32 (when accuracy critical)
         """
-        # New tiering: FP4 < FP8 < FP16 < FP32
-        # Note: FP4/FP8 support requires specialized hardware or custom kernels. Here
-        # we prefer FP4/FP8 for the lowest-complexity prompts but implement safe
-        # fallbacks (run in FP16) when the runtime does not support them.
-        if complexity <= 0.05:
-            # Extremely simple: FP4 (best energy savings) - simulated if unsupported
-            metrics = EnergyMetrics(
-                fp_tier='fp4',
-                power_saved_percent=65.0,  # Aggressive estimate
-                memory_saved_percent=75.0,  # Small footprint
-                relative_speed=2.2,
-                cumulative_energy_saved=0.0
-            )
-            return 'fp4', metrics
-
-        if complexity <= 0.2:
-            # Very low complexity: FP8
-            metrics = EnergyMetrics(
-                fp_tier='fp8',
-                power_saved_percent=55.0,
-                memory_saved_percent=60.0,
-                relative_speed=2.0,
-                cumulative_energy_saved=0.0
-            )
-            return 'fp8', metrics
+        return self.precision.analyze_complexity(
+            float(complexity), batch_size, param_count, seq_len
+        )
 
-        if complexity <= 0.7:
-            # Let precision manager determine optimal precision
-            tier, metrics = self.precision.analyze_complexity(float(complexity))
-            return tier, metrics
+    def apply_fp_for_workload(
+        self,
+        complexity: float,
+        batch_size: Optional[int] = None,
+        param_count: Optional[int] = None,
+        seq_len: Optional[int] = None
+    ) -> Tuple[str, EnergyMetrics]:
+        """Decide and record FP tier for upcoming workload.
 
-    def apply_fp_for_workload(self, complexity: float) -> Tuple[str, EnergyMetrics]:
-        """Decide and record FP tier for upcoming workload."""
-        fp_tier, metrics = self.precision.analyze_complexity(float(complexity))
+        batch_size, param_count and seq_len describe the workload when known;
+        they decide whether fp8/fp4 would actually save energy.
+        """
+        fp_tier, metrics = self.map_complexity_to_fp(complexity, batch_size, param_count, seq_len)
         self.current_fp_tier = fp_tier
         
         # Update energy savings with current telemetry
         metrics = self.telemetry.update_energy_metrics(metrics)
             
         # Record decision and metrics
-        self.monitoring_history.append({
-            'timestamp': time.time(),
-            'complexity': float(complexity),
-            'chosen_fp': fp_tier,
-            'power_saved_percent': metrics.power_saved_percent,
-            'memory_saved_percent': metrics.memory_saved_percent,
-            'energy_saved': metrics.cumulative_energy_saved
-        })
+        self.monitoring_history.append(
+            time.time(),
+            float(complexity),
+            fp_tier,
+            metrics.power_saved_percent,
+            metrics.memory_saved_percent
+        )
         
         self.energy_metrics.append(metrics)
         self.logger.info(
@@ -176,16 +348,74 @@ class GPUGovernor:
         )
         return fp_tier, metrics
 
-    def compute_joules_saved(self, duration_seconds: float, metrics: EnergyMetrics) -> float:
-        """Compute estimated energy savings using telemetry data."""
-        return self.telemetry.compute_energy_savings(duration_seconds, metrics)
+    def apply_fp_for_batch(
+        self,
+        complexities: np.ndarray,
+        batch_size: Optional[int] = None,
+        param_count: Optional[int] = None,
+        seq_len: Optional[int] = None
+    ) -> EnergyMetricsBatch:
+        """Decide and record FP tiers for many workloads in one pass.
+
+        Returns parallel arrays instead of one EnergyMetrics per workload;
+        the decisions are logged to monitoring_history but not to
+        energy_metrics. The current tier becomes the most precise one chosen.
+        """
+        complexities = np.asarray(complexities, dtype=np.float64)
+        batch = self.precision.select_precision_batch(complexities, batch_size, param_count, seq_len)
+        if len(batch):
+            self.current_fp_tier = self.precision.current_fp_tier
+        self.monitoring_history.extend(
+            time.time(),
+            complexities,
+            np.array(self.precision._TIER_NAMES, dtype=object)[batch.tier],
+            batch.power_saved_percent,
+            batch.memory_saved_percent,
+            np.nan  # not run yet, same as append()
+        )
+        self.logger.info(
+            f"Selected tiers for {len(batch)} workloads, current tier {self.current_fp_tier}"
+        )
+        return batch
+
+    def compute_joules_saved(
+        self,
+        duration_seconds: float,
+        metrics: EnergyMetrics,
+        power_actual: Optional[float] = None
+    ) -> float:
+        """Record the latest workload's run and return its estimated energy saved.
+
+        The run is stored on the newest history record; session totals come
+        from total_joules_saved() rather than per-call accumulation.
+        """
+        joules = self.precision.compute_energy_saved(
+            duration_seconds, self.baseline_power, power_actual, metrics
+        )
+        if self.monitoring_history:
+            self.monitoring_history.record_run(duration_seconds, power_actual, joules)
+        return joules
+
+    def total_joules_saved(self) -> float:
+        """Energy saved (J) over every recorded run, in one vectorized pass.
+
+        Measured power is used where known, otherwise the tier's estimated
+        savings against baseline_power. Records without a run are skipped.
+        """
+        log = self.monitoring_history
+        return _joules_saved_numpy(
+            log.column('duration'),
+            log.column('power_actual'),
+            log.column('power_saved'),
+            self.baseline_power
+        )
 
     def fp_precision_context(self):
         """Return a context manager for the current precision tier."""
         return self.precision.get_context(self.current_fp_tier)
     def collect_garbage(self):
         """Release unused GPU memory."""
-        self.telemetry.collect_garbage()
+        self.cleanup()
 
     def optimize_for_prompt(self, prompt_text: str) -> Tuple[str, Dict]:
         """Entry point for per-prompt optimization."""
@@ -207,7 +437,7 @@ class GPUGovernor:
     def get_status(self) -> Dict:
         """Get current state and optimization history."""
         current = self._get_gpu_state()
-        energy_saved = sum(m.cumulative_energy_saved for m in self.energy_metrics)
+        energy_saved = self.total_joules_saved()
         
         return {
             'gpu_state': current,
@@ -218,19 +448,18 @@ class GPUGovernor:
 
     def summarize_energy_savings(self) -> Dict[str, float]:
         """Get cumulative energy savings statistics."""
-        if not self.monitoring_history:
+        power = self.monitoring_history.column('power_saved')
+        # State snapshots carry NaN savings; only precision decisions count
+        decided = ~np.isnan(power)
+        if not decided.any():
             return {
                 'avg_power_saved_percent': 0.0,
                 'avg_memory_saved_percent': 0.0,
                 'total_joules_saved': 0.0
             }
 
-        avg_power = sum(m['power_saved_percent'] for m in self.monitoring_history) / len(self.monitoring_history)
-        avg_memory = sum(m['memory_saved_percent'] for m in self.monitoring_history) / len(self.monitoring_history)
-        total_energy = sum(m['energy_saved'] for m in self.monitoring_history)
-
         return {
-            'avg_power_saved_percent': avg_power,
-            'avg_memory_saved_percent': avg_memory,
-            'total_joules_saved': total_energy
+            'avg_power_saved_percent': float(power[decided].mean()),
+            'avg_memory_saved_percent': float(self.monitoring_history.column('memory_saved')[decided].mean()),
+            'total_joules_saved': self.total_joules_saved()
         }
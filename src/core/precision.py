@@ -1,40 +1,85 @@
 """Precision selection and energy metrics."""
+from bisect import bisect_left
 from dataclasses import dataclass
 from typing import Tuple, Optional
 from contextlib import nullcontext
+import numpy as np
 import torch
 import logging
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class EnergyMetrics:
-    """Energy and resource metrics for a precision tier."""
+    """Energy and resource metrics for a precision tier.
+
+    Immutable, so the per-tier instances are shared; energy actually saved
+    is tracked per run in the governor's history.
+    """
     fp_tier: str
     power_saved_percent: float
     memory_saved_percent: float
     relative_speed: float
-    cumulative_energy_saved: float
+
+@dataclass(frozen=True)
+class EnergyMetricsBatch:
+    """Structure-of-arrays form of many EnergyMetrics results."""
+    tier: np.ndarray                   # uint8 index into PrecisionManager._TIER_NAMES
+    power_saved_percent: np.ndarray
+    memory_saved_percent: np.ndarray
+    relative_speed: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.tier)
+
+    def __getitem__(self, i: int) -> EnergyMetrics:
+        """Materialize the scalar EnergyMetrics for one workload."""
+        return EnergyMetrics(
+            fp_tier=PrecisionManager._TIER_NAMES[self.tier[i]],
+            power_saved_percent=float(self.power_saved_percent[i]),
+            memory_saved_percent=float(self.memory_saved_percent[i]),
+            relative_speed=float(self.relative_speed[i])
+        )
+
+# Low-bit tensor cores: FP8 from Ada/Hopper, FP4 from Blackwell
+_LOW_BIT_MIN_CC = {'fp8': (8, 9), 'fp4': (10, 0)}
+# FP8 only beats fp16 on energy once the GEMMs saturate the GPU: roughly
+# batch 64 at 512 tokens; smaller batches spend more energy than they save
+_LOW_BIT_MIN_BATCH = 64
+_LOW_BIT_MIN_TOKENS = 64 * 512
+# Below this size, low-bit weight quantization overhead outweighs savings
+_LOW_BIT_MIN_PARAMS = 1_000_000_000
+
+
+def estimate_savings(
+    tier: str,
+    batch_size: Optional[int] = None,
+    param_count: Optional[int] = None,
+    compute_capability: Optional[Tuple[int, int]] = None,
+    seq_len: Optional[int] = None
+) -> float:
+    """Estimated power saved (percent vs fp32) running a workload at tier.
+
+    fp16/fp32 use the nominal PrecisionManager.TIERS figures. fp8/fp4 only
+    save energy on GPUs with matching tensor cores and on workloads large
+    enough to saturate them, so they return 0.0 whenever a known fact rules
+    that out. Arguments left as None are treated as unknown.
+    """
+    nominal = PrecisionManager.TIERS[tier]['power_saved_percent']
+    if tier not in _LOW_BIT_MIN_CC:
+        return nominal
+    if compute_capability is not None and tuple(compute_capability) < _LOW_BIT_MIN_CC[tier]:
+        return 0.0
+    if batch_size is not None:
+        if seq_len is not None:
+            if batch_size * seq_len < _LOW_BIT_MIN_TOKENS:
+                return 0.0
+        elif batch_size < _LOW_BIT_MIN_BATCH:
+            return 0.0
+    if param_count is not None and param_count < _LOW_BIT_MIN_PARAMS:
+        return 0.0
+    return nominal
+
 
 class PrecisionManager:
-    def get_context(self, tier: Optional[str] = None):
-        """Return a context manager for the given or current FP tier."""
-        if tier is None:
-            tier = self.current_fp_tier
-        if not torch.cuda.is_available():
-            return nullcontext()
-        # FP4/FP8 fall back to FP16
-        if tier in ('fp4', 'fp8'):
-            self.logger.warning(f"Requested {tier} execution, but low-bit precision requires specialized runtime support. Falling back to fp16.")
-            try:
-                return torch.amp.autocast('cuda', dtype=torch.float16)
-            except Exception:
-                return nullcontext()
-        if tier == 'fp16':
-            try:
-                return torch.amp.autocast('cuda', dtype=torch.float16)
-            except Exception:
-                return nullcontext()
-        # FP32 default
-        return nullcontext()
     """Manages FP precision selection and provides execution contexts."""
     
     # Precision tiers and their characteristics
@@ -54,6 +99,11 @@ class PrecisionManager:
             'memory_saved_percent': 50.0,
             'relative_speed': 1.5
         },
+        'bf16': {  # Same tensor-core rate as fp16, fp32 range (Ampere+)
+            'power_saved_percent': 45.0,
+            'memory_saved_percent': 50.0,
+            'relative_speed': 1.5
+        },
         'fp32': {  # Baseline
             'power_saved_percent': 0.0,
             'memory_saved_percent': 0.0,
@@ -61,55 +111,109 @@ class PrecisionManager:
         }
     }
     
+    # Shared immutable metrics per tier, handed out instead of new instances
+    _METRICS_TEMPLATES = {
+        name: EnergyMetrics(name, **figures) for name, figures in TIERS.items()
+    }
+    
+    # Upper complexity bound (inclusive) of each proposed tier but the last
+    _THRESHOLDS = (0.05, 0.2, 0.7)
+    _PROPOSALS = ('fp4', 'fp8', 'fp16', 'fp32')
+    # Every tier selection can end on, least to most precise; the two 16-bit
+    # tiers are alternatives for one device and never chosen together
+    _TIER_NAMES = ('fp4', 'fp8', 'fp16', 'bf16', 'fp32')
+    
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.current_fp_tier = 'fp32'
+        # One-time capability probe; None when there is no CUDA device
+        self._cc = torch.cuda.get_device_capability(0) if torch.cuda.is_available() else None
+        self._has_bf16 = self._cc is not None and self._cc >= (8, 0)
+        self._has_fp8 = self._cc is not None and self._cc >= _LOW_BIT_MIN_CC['fp8']
+        self._has_fp4 = self._cc is not None and self._cc >= _LOW_BIT_MIN_CC['fp4']
+        self._warned_tiers = set()
         
-    def analyze_complexity(self, complexity: float) -> Tuple[str, EnergyMetrics]:
-        """Analyze complexity and select precision tier with metrics."""
-        # Map complexity to FP tier
-        if complexity <= 0.05:
-            tier = 'fp4'
-        elif complexity <= 0.2:
-            tier = 'fp8'
-        elif complexity <= 0.7:
-            tier = 'fp16'
-        else:
-            tier = 'fp32'
-        metrics = EnergyMetrics(
-            fp_tier=tier,
-            power_saved_percent=self.TIERS[tier]['power_saved_percent'],
-            memory_saved_percent=self.TIERS[tier]['memory_saved_percent'],
-            relative_speed=self.TIERS[tier]['relative_speed'],
-            cumulative_energy_saved=0.0
-        )
+    def analyze_complexity(
+        self,
+        complexity: float,
+        batch_size: Optional[int] = None,
+        param_count: Optional[int] = None,
+        seq_len: Optional[int] = None
+    ) -> Tuple[str, EnergyMetrics]:
+        """Analyze complexity and select precision tier with metrics.
+
+        Complexity proposes a tier; a low-bit proposal (fp8/fp4) is only kept
+        when estimate_savings expects it to pay off for this workload on this
+        GPU, otherwise the next tier up is tried (fp4, then fp8, then 16-bit). Unknown workload facts do not
+        veto it. The 16-bit tier is bf16 on Ampere+ and fp16 before.
+        """
+        # Map complexity to FP tier: first threshold >= complexity
+        tier = self._PROPOSALS[bisect_left(self._THRESHOLDS, complexity)]
+        tier, _ = self._resolve_tier(tier, batch_size, param_count, seq_len)
         self.current_fp_tier = tier
-        return tier, metrics
+        return tier, self._METRICS_TEMPLATES[tier]
         
-        # Map complexity to FP tier
-        if complexity <= 0.05:
-            tier = 'fp4'
-        elif complexity <= 0.2:
+    def _resolve_tier(
+        self,
+        tier: str,
+        batch_size: Optional[int],
+        param_count: Optional[int],
+        seq_len: Optional[int]
+    ) -> Tuple[str, float]:
+        """Turn a proposed tier into the one to run; return (tier, power saved).
+
+        An unprofitable fp4 proposal tries fp8 next, an unprofitable fp8 one
+        drops to 16-bit, and 16-bit means bf16 where the GPU supports it.
+        """
+        power_saved = estimate_savings(tier, batch_size, param_count, self._cc, seq_len)
+        if tier == 'fp4' and power_saved <= 0.0:
             tier = 'fp8'
-        elif complexity <= 0.7:
+            power_saved = estimate_savings(tier, batch_size, param_count, self._cc, seq_len)
+        if tier == 'fp8' and power_saved <= 0.0:
             tier = 'fp16'
-        else:
-            tier = 'fp32'
-        metrics = EnergyMetrics(
-            fp_tier=tier,
-            power_saved_percent=self.TIERS[tier]['power_saved_percent'],
-            memory_saved_percent=self.TIERS[tier]['memory_saved_percent'],
-            relative_speed=self.TIERS[tier]['relative_speed'],
-            cumulative_energy_saved=0.0
+        if tier == 'fp16':
+            if self._has_bf16:
+                tier = 'bf16'
+            power_saved = estimate_savings(tier)
+        return tier, power_saved
+
+    def select_precision_batch(
+        self,
+        complexities: np.ndarray,
+        batch_size: Optional[int] = None,
+        param_count: Optional[int] = None,
+        seq_len: Optional[int] = None
+    ) -> EnergyMetricsBatch:
+        """Vectorized analyze_complexity over many complexity scores.
+
+        The workload description applies to every entry. Tier rules are
+        resolved once per tier, then each score is a searchsorted plus
+        table gathers. current_fp_tier becomes the most precise tier in the
+        batch, the one a batch run together needs.
+        """
+        # Per proposed tier: effective tier index and its power savings
+        resolved = [self._resolve_tier(t, batch_size, param_count, seq_len) for t in self._PROPOSALS]
+        effective = np.array([self._TIER_NAMES.index(t) for t, _ in resolved], dtype=np.uint8)
+        power_by_proposal = np.array([saved for _, saved in resolved])
+        memory_by_tier = np.array([self.TIERS[t]['memory_saved_percent'] for t in self._TIER_NAMES])
+        speed_by_tier = np.array([self.TIERS[t]['relative_speed'] for t in self._TIER_NAMES])
+
+        proposal = np.searchsorted(self._THRESHOLDS, np.asarray(complexities, dtype=np.float64))
+        tier = effective[proposal]
+        if len(tier):
+            self.current_fp_tier = self._TIER_NAMES[tier.max()]
+        return EnergyMetricsBatch(
+            tier=tier,
+            power_saved_percent=power_by_proposal[proposal],
+            memory_saved_percent=memory_by_tier[tier],
+            relative_speed=speed_by_tier[tier]
         )
-        self.current_fp_tier = tier
-        return tier, metrics
         
     def get_execution_context(self, tier: Optional[str] = None):
         """Get appropriate execution context for precision tier.
         
         Args:
-            tier: Precision tier ('fp4','fp8','fp16','fp32'). If None, uses current.
+            tier: Precision tier ('fp4','fp8','fp16','bf16','fp32'). If None, uses current.
             
         Returns:
             Context manager for running operations at specified precision.
@@ -120,26 +224,39 @@ class PrecisionManager:
         if not torch.cuda.is_available():
             return nullcontext()
             
-        # FP4/FP8 fall back to FP16 since they need special runtime support
+        # Autocast can only lower to fp16/bf16; real FP8/FP4 GEMMs need
+        # explicitly scaled kernels (torch._scaled_mm). Low-bit tiers run at
+        # the cheapest autocast dtype instead: bf16 on Ampere+, else fp16.
         if tier in ('fp4', 'fp8'):
-            self.logger.warning(
-                f"Requested {tier} execution, but low-bit precision requires "
-                "specialized runtime support. Falling back to fp16 for safety."
-            )
+            dtype = torch.bfloat16 if self._has_bf16 else torch.float16
+            if tier not in self._warned_tiers:
+                self._warned_tiers.add(tier)
+                native = self._has_fp4 if tier == 'fp4' else self._has_fp8
+                self.logger.warning(
+                    f"Requested {tier} execution on sm_{self._cc[0]}{self._cc[1]}: "
+                    + ("autocast cannot target its low-bit tensor cores"
+                       if native else f"no {tier} tensor cores")
+                    + f"; running {str(dtype).replace('torch.', '')} instead."
+                )
             try:
-                return torch.amp.autocast('cuda', dtype=torch.float16)
+                return torch.amp.autocast('cuda', dtype=dtype)
             except Exception:
                 return nullcontext()
                 
-        # Native FP16 support via autocast
-        if tier == 'fp16':
+        # Native FP16/BF16 support via autocast
+        if tier in ('fp16', 'bf16'):
+            dtype = torch.bfloat16 if tier == 'bf16' else torch.float16
             try:
-                return torch.amp.autocast('cuda', dtype=torch.float16)
+                return torch.amp.autocast('cuda', dtype=dtype)
             except Exception:
                 return nullcontext()
                 
         # FP32 default
         return nullcontext()
+
+    def get_context(self, tier: Optional[str] = None):
+        """Return a context manager for the given or current FP tier."""
+        return self.get_execution_context(tier)
         
     def compute_energy_saved(
         self,
@@ -169,9 +286,4 @@ class PrecisionManager:
         # Compute energy saved
         baseline_joules = power_baseline * duration
         actual_joules = power_used * duration
-        joules_saved = max(0.0, baseline_joules - actual_joules)
-        
-        # Update cumulative savings
-        metrics.cumulative_energy_saved += joules_saved
-        
-        return joules_saved
\ No newline at end of file
+        return max(0.0, baseline_joules - actual_joules)
\ No newline at end of file
@@ -1,13 +1,9 @@
 """GPU telemetry and power monitoring."""
 import logging
+import time
 from dataclasses import dataclass
 from typing import Optional, Dict
 
-try:
-    import pynvml
-except ImportError:
-    pynvml = None
-
 @dataclass
 class GPUTelemetry:
     """GPU telemetry data point."""
@@ -34,21 +30,36 @@ class TelemetryManager:
         )
     def update_energy_metrics(self, metrics):
         """Update energy metrics with current telemetry (stub for now)."""
-        # In a real implementation, update metrics.cumulative_energy_saved using live telemetry
+        # In a real implementation, return an adjusted copy (EnergyMetrics is
+        # frozen) based on live telemetry
         return metrics
     """Manages GPU telemetry collection via NVML."""
     def __init__(self, gpu_id: int = 0):
         self.logger = logging.getLogger(__name__)
         self.gpu_id = gpu_id
-        self._nvml = pynvml
+        self._nvml = None  # pynvml module, imported by _init_nvml
         self._nvml_initialized = False
         self._nvml_handle = None
+        # Short-lived cache: back-to-back callers (optimize -> status) share
+        # one round of NVML driver calls
+        # (monotonic timestamp, reading), swapped as one tuple so readers
+        # never see a mismatched pair
+        self._cache = (float('-inf'), None)
+        self._ttl = 0.05
+        self._total_memory_mb = None  # read once, only if NVML is unavailable
         self._init_nvml()
 
     def _init_nvml(self):
         """Initialize NVML for power/temp monitoring."""
-        if not self._nvml or self._nvml_initialized:
+        if self._nvml_initialized:
+            return
+        # Imported here so processes that never build a TelemetryManager
+        # don't load NVML bindings
+        try:
+            import pynvml
+        except ImportError:
             return
+        self._nvml = pynvml
         try:
             self._nvml.nvmlInit()
             self._nvml_handle = self._nvml.nvmlDeviceGetHandleByIndex(self.gpu_id)
@@ -59,17 +70,40 @@ class TelemetryManager:
             self._nvml = None
     
     def get_telemetry(self) -> Optional[GPUTelemetry]:
-        """Get current GPU telemetry."""
+        """Get current GPU telemetry; readings younger than the TTL (50ms) are reused."""
+        now = time.monotonic()
+        ts, telemetry = self._cache
+        if now - ts >= self._ttl:
+            telemetry = self._read_telemetry()
+            self._cache = (now, telemetry)
+        return telemetry
+
+    def _read_telemetry(self) -> Optional[GPUTelemetry]:
+        """Query PyTorch and NVML for a fresh telemetry reading."""
         import torch
-        import time
         
         if not torch.cuda.is_available():
             return None
             
         try:
-            # Basic metrics via PyTorch
-            memory_used = torch.cuda.memory_allocated() / 1024**2
-            memory_total = torch.cuda.get_device_properties(0).total_memory / 1024**2
+            nvml_up = bool(self._nvml and self._nvml_initialized and self._nvml_handle)
+            mem = None
+            if nvml_up:
+                try:
+                    # NVML memory is more accurate; with it the PyTorch
+                    # queries below are unnecessary
+                    mem = self._nvml.nvmlDeviceGetMemoryInfo(self._nvml_handle)
+                except Exception as e:
+                    self.logger.debug(f"NVML memory query failed: {e}")
+            if mem is not None:
+                memory_used = float(mem.used) / 1024**2
+                memory_total = float(mem.total) / 1024**2
+            else:
+                # Basic metrics via PyTorch; the device total never changes
+                if self._total_memory_mb is None:
+                    self._total_memory_mb = torch.cuda.get_device_properties(0).total_memory / 1024**2
+                memory_used = torch.cuda.memory_allocated() / 1024**2
+                memory_total = self._total_memory_mb
             
             # Try utilization (PyTorch >=2.2)
             try:
@@ -88,13 +122,8 @@ class TelemetryManager:
             )
             
             # Enrich with NVML data if available
-            if self._nvml and self._nvml_initialized and self._nvml_handle:
+            if nvml_up:
                 try:
-                    # Update memory from NVML (more accurate)
-                    mem = self._nvml.nvmlDeviceGetMemoryInfo(self._nvml_handle)
-                    telemetry.memory_used = float(mem.used) / 1024**2
-                    telemetry.memory_total = float(mem.total) / 1024**2
-                    
                     # Get power (milliwatts)
                     try:
                         pwr_mw = self._nvml.nvmlDeviceGetPowerUsage(self._nvml_handle)
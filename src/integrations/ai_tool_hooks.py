@@ -2,9 +2,24 @@
 import torch
 import functools
 import logging
-from typing import Callable, Any, Dict
+from typing import Callable, Any, Dict, Optional
 from ..core import GPUGovernor
 
+@functools.lru_cache(maxsize=1024)
+def _name_to_complexity(func_name: str) -> Optional[float]:
+    """Complexity implied by a function's name, or None if it says nothing."""
+    func_name = func_name.lower()
+    
+    # High complexity indicators
+    if any(keyword in func_name for keyword in ['train', 'fine_tune', 'generate_large', 'process_batch']):
+        return 0.8
+    
+    # Medium complexity indicators
+    if any(keyword in func_name for keyword in ['infer', 'predict', 'encode', 'decode']):
+        return 0.5
+    
+    return None
+
 class AIToolOptimizer:
     """Automatic GPU optimization for AI tools and frameworks."""
     
@@ -12,6 +27,10 @@ class AIToolOptimizer:
         self.governor = GPUGovernor()
         self.logger = logging.getLogger(__name__)
         self.optimization_enabled = True
+        # Hints are fixed per decorated function; score each one once
+        self._hint_complexity = functools.lru_cache(maxsize=1024)(
+            self.governor.analyzer.estimate_complexity
+        )
         
     def auto_optimize(self, complexity_hint: str = None):
         """Decorator to automatically optimize GPU for AI tool functions."""
@@ -24,9 +43,8 @@ class AIToolOptimizer:
                 # Analyze function complexity
                 complexity = self._analyze_function_complexity(func, args, kwargs, complexity_hint)
                 
-                # Apply optimization
-                self.governor.optimize_for_workload(complexity)
-                fp_tier = self.governor.apply_fp_for_workload(complexity)
+                # Apply optimization: one decision, one history record
+                fp_tier, _ = self.governor.apply_fp_for_workload(complexity)
                 
                 self.logger.info(f"Auto-optimized {func.__name__} with {fp_tier.upper()} precision")
                 
@@ -42,20 +60,14 @@ class AIToolOptimizer:
         """Analyze the complexity of a function call."""
         # Use hint if provided
         if hint:
-            return self.governor.analyzer.analyze_complexity(hint)
-        
-        # Analyze based on function name and arguments
-        func_name = func.__name__.lower()
-        
-        # High complexity indicators
-        if any(keyword in func_name for keyword in ['train', 'fine_tune', 'generate_large', 'process_batch']):
-            return 0.8
+            return self._hint_complexity(hint)
         
-        # Medium complexity indicators
-        if any(keyword in func_name for keyword in ['infer', 'predict', 'encode', 'decode']):
-            return 0.5
+        # Analyze based on function name (fixed per wrapped function, so cached)
+        complexity = _name_to_complexity(func.__name__)
+        if complexity is not None:
+            return complexity
         
-        # Analyze tensor sizes if present
+        # Analyze the size of the first tensor argument
         for arg in args:
             if isinstance(arg, torch.Tensor):
                 size = arg.numel()
@@ -63,6 +75,7 @@ class AIToolOptimizer:
                     return 0.7
                 elif size > 100000:  # > 100K elements
                     return 0.4
+                break
         
         return 0.3  # Default low complexity
     
@@ -93,12 +106,16 @@ class AIToolOptimizer:
         
         complexity = min(1.0, complexity)
         
-        self.governor.optimize_for_workload(complexity)
-        return self.governor.apply_fp_for_workload(complexity)
+        return self.governor.apply_fp_for_workload(
+            complexity,
+            batch_size=params.get('batch_size'),
+            param_count=params.get('param_count'),
+            seq_len=params.get('sequence_length')
+        )
     
     def get_energy_savings_summary(self) -> Dict[str, Any]:
         """Get summary of energy savings from AI workloads."""
-        total_saved = sum(self.governor.energy_metrics)
+        total_saved = self.governor.total_joules_saved()
         history = self.governor.get_optimization_history()
         
         return {
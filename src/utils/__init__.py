@@ -1,9 +1,10 @@
 """GPU governor utility functions."""
-from .metrics import compute_running_average, log_metrics_to_csv, format_joules, format_watts
+from .metrics import compute_running_average, log_metrics_to_csv, CsvMetricsSink, format_joules, format_watts
 
 __all__ = [
     'compute_running_average',
     'log_metrics_to_csv',
+    'CsvMetricsSink',
     'format_joules',
     'format_watts'
 ]
\ No newline at end of file
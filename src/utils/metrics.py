@@ -1,51 +1,98 @@
 """Utility functions for energy and performance metrics."""
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import time
 import csv
 from pathlib import Path
+import numpy as np
 
 def compute_running_average(values: List[float], window: int = 5) -> List[float]:
     """Compute running average over a window."""
+    if window < 1:
+        raise ValueError(f"window must be >= 1, got {window}")
     if not values:
         return []
-    result = []
-    for i in range(len(values)):
-        start = max(0, i - window + 1)
-        window_vals = values[start:i + 1]
-        result.append(sum(window_vals) / len(window_vals))
-    return result
+    # Window sums as differences of one prefix sum: O(N) regardless of window
+    v = np.asarray(values, dtype=np.float64)
+    cs = np.concatenate(([0.0], np.cumsum(v)))
+    idx = np.arange(1, len(v) + 1)
+    lo = np.maximum(0, idx - window)
+    return ((cs[idx] - cs[lo]) / (idx - lo)).tolist()
+
+def _read_csv_header(path: Path) -> Optional[List[str]]:
+    """Column names of an existing CSV file, or None if it is missing or empty."""
+    try:
+        with open(path, newline='') as f:
+            return next(csv.reader(f), None)
+    except FileNotFoundError:
+        return None
+
+class CsvMetricsSink:
+    """Streaming CSV writer for metric rows.
+
+    The file is opened once in append mode with a 64 KiB buffer; the header
+    is only written when the file is new or empty. Appending to a file whose
+    header differs from fieldnames raises ValueError rather than writing
+    misaligned rows. A row with keys outside fieldnames raises ValueError;
+    missing ones are left blank.
+    """
+    
+    def __init__(self, path: str, fieldnames: List[str]):
+        output_path = Path(path)
+        existing = _read_csv_header(output_path)
+        if existing is not None and existing != list(fieldnames):
+            raise ValueError(
+                f"{output_path} has columns {existing}; cannot append rows with {list(fieldnames)}"
+            )
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(output_path, 'a', newline='', buffering=1 << 16)
+        self._writer = csv.DictWriter(self._file, fieldnames=fieldnames)
+        if self._file.tell() == 0:
+            self._writer.writeheader()
+    
+    def write(self, entry: Dict[str, Any]) -> None:
+        self._writer.writerow(entry)
+    
+    def write_many(self, entries: List[Dict[str, Any]]) -> None:
+        self._writer.writerows(entries)
+    
+    def close(self) -> None:
+        self._file.close()
+    
+    def __enter__(self) -> 'CsvMetricsSink':
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.close()
 
 def log_metrics_to_csv(
     metrics: List[Dict[str, Any]],
     output_file: str,
-    timestamp_key: str = 'timestamp'
+    timestamp_key: str = 'timestamp',
+    fieldnames: Optional[List[str]] = None
 ) -> None:
-    """Log metrics to CSV file.
+    """Append metrics to a CSV file.
     
     Args:
         metrics: List of metric dictionaries
         output_file: Path to output CSV
         timestamp_key: Key for timestamp in metrics
+        fieldnames: Columns to write; defaults to the existing file's header,
+            or for a new file the sorted union of all keys
+
+    Raises:
+        ValueError: If a metric has keys that are not among the columns;
+            checked before any row is written
     """
     if not metrics:
         return
         
-    # Ensure parent directory exists
-    output_path = Path(output_file)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    # Get all unique keys as columns
-    columns = set()
-    for entry in metrics:
-        columns.update(entry.keys())
-    columns = sorted(list(columns))
-    
-    # Write CSV
-    with open(output_file, 'w', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=columns)
-        writer.writeheader()
-        for entry in metrics:
-            writer.writerow(entry)
+    if fieldnames is None:
+        fieldnames = _read_csv_header(Path(output_file)) or sorted(set().union(*metrics))
+    extra = set().union(*metrics).difference(fieldnames)
+    if extra:
+        raise ValueError(f"{output_file} has no columns for {sorted(extra)}")
+    with CsvMetricsSink(output_file, fieldnames) as sink:
+        sink.write_many(metrics)
 
 def format_joules(joules: float, precision: int = 1) -> str:
     """Format energy value with appropriate unit prefix."""
@@ -0,0 +1,61 @@
+import dataclasses
+import importlib.util
+import sys
+import pytest
+from src.analyzer import fast_complexity_analyzer
+from src.analyzer.fast_complexity_analyzer import FastComplexityAnalyzer
+from src.core import complexity_analyzer
+
+PROMPTS = [
+    "simple add",
+    "loop the matrix multiply 5000 times",
+    "process 16GB of data with LSTM",
+    "matrix multiplication 4096x4096 iterate 200 steps 1500",
+    "train deep neural network, deep learning on 64GB, loop 2000 steps, neural network",
+    "",
+]
+
+def test_batch_matches_scalar_analysis():
+    analyzer = FastComplexityAnalyzer()
+    batch = analyzer.analyze_prompts(PROMPTS)
+    assert len(batch) == len(PROMPTS)
+    for i, prompt in enumerate(PROMPTS):
+        assert batch[i] == analyzer.analyze_prompt(prompt), f"Mismatch for {prompt!r}"
+
+def test_batch_levels():
+    batch = FastComplexityAnalyzer().analyze_prompts(PROMPTS)
+    assert [batch[i].complexity_level for i in range(len(batch))] == [
+        'low', 'low', 'medium', 'medium', 'high', 'low'
+    ]
+
+NON_ASCII_PROMPTS = [
+    "é12x34 matrices, iterate 500 steps",
+    "12x34é matrix multiply",
+    "٣x٤ matrix, batch size=٣٢",
+    "trainé the neural network",
+    "naïve train on 64GB",
+    "rendering é fft×2 ray-trace",
+    "entraîner fft, 2048×2048 loop ٢٠٠٠ times",
+]
+
+def _load_stdlib_copy(monkeypatch, module):
+    """Fresh copy of module as if google-re2 and pyahocorasick were missing."""
+    monkeypatch.setitem(sys.modules, 're2', None)
+    monkeypatch.setitem(sys.modules, 'ahocorasick', None)
+    spec = importlib.util.spec_from_file_location(module.__name__ + '_stdlib', module.__file__)
+    copy = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(copy)
+    return copy
+
+def test_estimate_complexity_independent_of_regex_backend(monkeypatch):
+    pytest.importorskip('re2')
+    stdlib = _load_stdlib_copy(monkeypatch, complexity_analyzer)
+    for prompt in PROMPTS + NON_ASCII_PROMPTS:
+        assert stdlib.estimate_complexity(prompt) == complexity_analyzer.estimate_complexity(prompt), prompt
+
+def test_fast_analysis_independent_of_regex_backend(monkeypatch):
+    pytest.importorskip('re2')
+    stdlib = _load_stdlib_copy(monkeypatch, fast_complexity_analyzer)
+    for prompt in PROMPTS + NON_ASCII_PROMPTS:
+        assert (dataclasses.astuple(stdlib.FastComplexityAnalyzer().analyze_prompt(prompt))
+                == dataclasses.astuple(FastComplexityAnalyzer().analyze_prompt(prompt))), prompt
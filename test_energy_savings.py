@@ -1,4 +1,18 @@
+import functools
+import torch
+import time
+import pytest
+import numpy as np
+from src.core import gpu_controller
+from src.core.gpu_controller import GPUGovernor, TelemetryLog
+from src.core.precision import PrecisionManager, estimate_savings
+
+# Route fp32 matmuls/convolutions through TF32 tensor cores on Ampere+
+torch.set_float32_matmul_precision('high')
+torch.backends.cuda.matmul.allow_tf32 = True
+torch.backends.cudnn.allow_tf32 = True
 
+@torch.inference_mode()
 def demonstrate_energy_savings():
     governor = GPUGovernor()
     print("\nEnergy Conservation Demo")
@@ -19,23 +33,21 @@ def demonstrate_energy_savings():
         print(f"Complexity Score: {complexity:.2f}")
         
         # Let governor select precision (returns tier and EnergyMetrics)
-        fp_result = governor.apply_fp_for_workload(complexity)
-        if isinstance(fp_result, tuple):
-            fp_tier, energy_metrics = fp_result
-        else:
-            fp_tier = fp_result
-            energy_metrics = None
+        fp_tier, energy_metrics = governor.apply_fp_for_workload(complexity)
         
         # Create sample workload (matrix multiplication)
         size = 1024 if complexity < 0.5 else 2048
         with governor.fp_precision_context():
-            A = torch.randn(size, size, device='cuda')
-            B = torch.randn(size, size, device='cuda')
+            A, B, C = _get_bufs(size)
+            start_ev = torch.cuda.Event(enable_timing=True)
+            end_ev = torch.cuda.Event(enable_timing=True)
             
-            start = time.time()
-            C = torch.matmul(A, B)
-            torch.cuda.synchronize()
-            duration = time.time() - start
+            # Events bracket only the matmul
+            start_ev.record()
+            torch.matmul(A, B, out=C)
+            end_ev.record()
+            end_ev.synchronize()
+            duration = start_ev.elapsed_time(end_ev) / 1000.0
         
         # Get runtime metrics
         runtime_metrics = governor.get_current_metrics()
@@ -45,10 +57,54 @@ def demonstrate_energy_savings():
         print(f"GPU Utilization: {runtime_metrics.get('utilization', 'n/a')}")
         print(f"Memory Usage: {runtime_metrics.get('memory_used', 'n/a')}")
         print(f"Estimated Power Savings: {history.get('power_saved_percent', 0.0):.1f}%")
-import torch
-import time
-import pytest
-from src.core.gpu_controller import GPUGovernor
+
+    # One allocator flush at the end; cases in between reuse cached blocks
+    torch.cuda.empty_cache()
+
+@functools.lru_cache(maxsize=None)
+def _cuda_generator():
+    """Seeded once; created lazily because it needs a CUDA device."""
+    g = torch.Generator(device='cuda')
+    g.manual_seed(0)
+    return g
+
+# Largest matmul the cases run (complexity >= 0.5)
+_MAX_SIZE = 2048
+
+@functools.lru_cache(maxsize=None)
+def _full_inputs():
+    """Matmul inputs at _MAX_SIZE, generated once and shared by every case.
+
+    Only the matmul is timed, so the one-time RNG fill stays out of the
+    measured energy.
+    """
+    return (torch.empty(_MAX_SIZE, _MAX_SIZE, device='cuda').normal_(generator=_cuda_generator()),
+            torch.empty(_MAX_SIZE, _MAX_SIZE, device='cuda').normal_(generator=_cuda_generator()))
+
+# (size, dtype) -> (A, B, C), filled lazily by _get_bufs
+_WORKLOAD_CACHE = {}
+
+def _get_bufs(size):
+    """Matmul operands and output for size, built once per (size, dtype).
+
+    out= matmuls bypass autocast, so the buffers are created in the dtype
+    the active precision context would cast to; the cast happens once
+    here instead of inside every timed matmul.
+    """
+    if hasattr(torch, 'get_autocast_dtype'):
+        enabled, dtype = torch.is_autocast_enabled('cuda'), torch.get_autocast_dtype('cuda')
+    else:  # torch < 2.4
+        enabled, dtype = torch.is_autocast_enabled(), torch.get_autocast_gpu_dtype()
+    dtype = dtype if enabled else torch.float32
+    bufs = _WORKLOAD_CACHE.get((size, dtype))
+    if bufs is None:
+        A_full, B_full = _full_inputs()
+        bufs = _WORKLOAD_CACHE[(size, dtype)] = (
+            A_full[:size, :size].to(dtype),
+            B_full[:size, :size].to(dtype),
+            torch.empty(size, size, device='cuda', dtype=dtype)
+        )
+    return bufs
 
 @pytest.mark.parametrize("desc,complexity,expected_fp", [
     ("Simple matrix multiply (2x2)", 0.1, "fp8"),
@@ -57,18 +113,95 @@ from src.core.gpu_controller import GPUGovernor
 ])
 def test_energy_savings_fp_selection(desc, complexity, expected_fp):
     governor = GPUGovernor()
+    cc = torch.cuda.get_device_capability()
+    if expected_fp == "fp8" and cc < (8, 9):
+        expected_fp = "fp16"  # no FP8 tensor cores, so FP8 would save nothing
+    if expected_fp == "fp16" and cc >= (8, 0):
+        expected_fp = "bf16"  # Ampere+ runs the 16-bit tier as bf16
     fp_tier, energy_metrics = governor.apply_fp_for_workload(complexity)
     assert fp_tier == expected_fp, f"Expected {expected_fp}, got {fp_tier} for {desc}"
     assert energy_metrics.power_saved_percent >= 0.0
-    # Simulate workload
+    # Simulate workload; inference mode as in the demo, which may have
+    # created the cached buffers this case writes into
     size = 1024 if complexity < 0.5 else 2048
-    with governor.fp_precision_context():
-        A = torch.randn(size, size, device='cuda')
-        B = torch.randn(size, size, device='cuda')
-        start = time.time()
-        C = torch.matmul(A, B)
-        torch.cuda.synchronize()
-        duration = time.time() - start
+    with torch.inference_mode(), governor.fp_precision_context():
+        A, B, C = _get_bufs(size)
+        start_ev = torch.cuda.Event(enable_timing=True)
+        end_ev = torch.cuda.Event(enable_timing=True)
+        # Events bracket only the matmul
+        start_ev.record()
+        torch.matmul(A, B, out=C)
+        end_ev.record()
+        end_ev.synchronize()
+        duration = start_ev.elapsed_time(end_ev) / 1000.0
     runtime_metrics = governor.get_current_metrics()
     assert 'utilization' in runtime_metrics
-    assert 'memory_used' in runtime_metrics
\ No newline at end of file
+    assert 'memory_used' in runtime_metrics
+
+@pytest.mark.parametrize("kwargs,saves", [
+    (dict(), True),
+    (dict(compute_capability=(8, 6)), False),
+    (dict(compute_capability=(9, 0), batch_size=8), False),
+    (dict(compute_capability=(9, 0), batch_size=64, seq_len=128), False),
+    (dict(compute_capability=(9, 0), batch_size=64, seq_len=512), True),
+    (dict(compute_capability=(9, 0), batch_size=128, param_count=125_000_000), False),
+    (dict(compute_capability=(9, 0), batch_size=128, param_count=7_000_000_000), True),
+])
+def test_fp8_savings_require_saturating_workload(kwargs, saves):
+    assert (estimate_savings('fp8', **kwargs) > 0.0) == saves
+    assert estimate_savings('fp16', **kwargs) == 45.0
+
+def test_fp4_proposal_falls_back_to_fp8_on_hopper():
+    manager = PrecisionManager()
+    manager._cc, manager._has_bf16 = (9, 0), True  # FP8 tensor cores, no FP4
+    tier, metrics = manager.analyze_complexity(0.01, batch_size=128, param_count=7_000_000_000)
+    assert tier == 'fp8' and metrics.power_saved_percent == 55.0
+    assert manager.analyze_complexity(0.01, batch_size=8)[0] == 'bf16'
+
+def test_summaries_skip_state_snapshots():
+    governor = GPUGovernor()
+    governor.apply_fp_for_workload(0.5)
+    governor.apply_fp_for_workload(0.9)
+    governor.monitoring_history.append(time.time(), 0.4)  # state snapshot, no decision
+    summary = governor.summarize_energy_savings()
+    assert summary['avg_power_saved_percent'] == 22.5
+    assert governor.get_optimization_history()['total_optimizations'] == 3
+    cc = torch.cuda.get_device_capability() if torch.cuda.is_available() else None
+    # Ampere+ runs the 16-bit tier as bf16
+    expected_fp = 'bf16' if cc is not None and cc >= (8, 0) else 'fp16'
+    assert governor.monitoring_history[0]['chosen_fp'] == expected_fp
+
+def test_history_ring_keeps_newest_records():
+    log = TelemetryLog(maxlen=4)
+    for i in range(7):
+        log.append(float(i), i / 10)
+    assert len(log) == 4
+    assert log.column('ts').tolist() == [3.0, 4.0, 5.0, 6.0]
+    assert log[0]['timestamp'] == 3.0 and log[-1]['timestamp'] == 6.0
+
+def test_batch_selection_matches_scalar():
+    complexities = [0.0, 0.05, 0.1, 0.2, 0.5, 0.7, 0.9, 1.0]
+    batch = GPUGovernor().apply_fp_for_batch(complexities)
+    governor = GPUGovernor()
+    for i, c in enumerate(complexities):
+        assert batch[i] == governor.apply_fp_for_workload(c)[1]
+
+def test_total_joules_saved_uses_measured_power_when_known():
+    governor = GPUGovernor()
+    governor.apply_fp_for_workload(0.5)              # fp16, 45% estimated
+    assert governor.compute_joules_saved(2.0, governor.energy_metrics[-1]) == pytest.approx(90.0)
+    governor.apply_fp_for_workload(0.9)
+    governor.compute_joules_saved(1.0, governor.energy_metrics[-1], power_actual=70.0)
+    governor.apply_fp_for_workload(0.5)              # never run: not counted
+    assert governor.total_joules_saved() == pytest.approx(90.0 + 30.0)
+
+def test_joules_replay_kernel_matches_numpy():
+    rng = np.random.default_rng(0)
+    n = gpu_controller._JIT_MIN_RECORDS
+    duration = rng.uniform(0.0, 2.0, n)
+    duration[rng.random(n) < 0.3] = np.nan           # snapshots without a run
+    power_actual = rng.uniform(50.0, 150.0, n)
+    power_actual[rng.random(n) < 0.5] = np.nan
+    power_saved = rng.choice([0.0, 45.0, 55.0, np.nan], n)
+    expected = gpu_controller._joules_saved_numpy(duration, power_actual, power_saved, 100.0)
+    assert gpu_controller.replay_joules_saved(duration, power_actual, power_saved, 100.0) == pytest.approx(expected)